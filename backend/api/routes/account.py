@@ -15,6 +15,11 @@ async def get_holdings(session_token: str = Depends(get_current_session)) -> Dic
     """Get current portfolio holdings"""
     return await flattrade_client.get_holdings(session_token)
 
+@router.get("/dashboard")
+async def get_dashboard(session_token: str = Depends(get_current_session)) -> Dict[str, Any]:
+    """Get holdings, orders, trades and user details in a single round-trip"""
+    return await flattrade_client.get_dashboard(session_token)
+
 from services.portfolio_service import portfolio_service
 
 @router.get("/orders")
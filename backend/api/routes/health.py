@@ -2,10 +2,9 @@ from fastapi import APIRouter
 from datetime import datetime
 from pydantic import BaseModel
 from services import health_service
-from services.health_service import api_health_service
 from models.schemas import HealthResponse
 
-health_service_instance = api_health_service()
+health_service_instance = health_service.health_service
 router = APIRouter(tags=["Health"])
 
 @router.get("/health", summary="API Health Check", response_model=HealthResponse)
@@ -1,7 +1,7 @@
 
 from fastapi import APIRouter, Depends, HTTPException
 from typing import List
-from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse
 from core.dependencies import get_current_session
 from core.logging import get_logger
 from models.schemas import Position
@@ -20,13 +20,14 @@ async def get_positions(session_token: str = Depends(get_current_session)):
 
 
 # Endpoint for portfolio stats and positions (for Portfolio.js)
-@router.get("", tags=["Portfolio"])
+@router.get("", tags=["Portfolio"], response_class=ORJSONResponse)
 async def get_portfolio(session_token: str = Depends(get_current_session)):
     """Get portfolio stats and positions for dashboard"""
     try:
         data = await portfolio_service.get_portfolio(session_token)
         #print('Portfolio Data in get_portfolio:', data)
-        return jsonable_encoder(data)
+        # Already plain JSON types; serialize straight to bytes with orjson
+        return ORJSONResponse(data)
     except Exception as e:
         return {
             "success": False,
@@ -1,3 +1,4 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import logging
@@ -5,6 +6,9 @@ import logging
 from config.settings import get_settings
 from api.routes import auth, portfolio, orders,  account, health, market_data
 from core.exceptions import add_exception_handlers
+from services.flattrade_client import flattrade_client
+from services.health_service import health_service
+from services.portfolio_service import portfolio_service
 
 # --- ASGI middleware to log raw websocket handshake scope (query string + headers) ---
 class WSLoggingMiddleware:
@@ -36,6 +40,15 @@ class WSLoggingMiddleware:
         await self.app(scope, receive, send)
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Release shared HTTP connection pools on shutdown"""
+    yield
+    await flattrade_client.aclose()
+    await health_service.aclose()
+    await portfolio_service.aclose()
+
+
 def create_app() -> FastAPI:
     """Create and configure FastAPI application"""
     settings = get_settings()
@@ -43,7 +56,8 @@ def create_app() -> FastAPI:
     app = FastAPI(
         title="Trading API",
         version="2.0.0",
-        description="Modular Trading API with Flattrade Integration"
+        description="Modular Trading API with Flattrade Integration",
+        lifespan=lifespan
     )
 
     # Configure CORS
@@ -89,6 +103,9 @@ if __name__ == "__main__":
         "main:app",
         host=settings.HOST,
         port=settings.PORT,
-        reload=settings.DEBUG
+        reload=settings.DEBUG,
+        # Compress client websocket frames; batched JSON ticks deflate well
+        ws="websockets",
+        ws_per_message_deflate=True
     )
    
\ No newline at end of file
@@ -1,8 +1,14 @@
 # services/flattrade_client.py - Enhanced with debugging and token validation
+import asyncio
 import hashlib
 import inspect
 import json
+import logging
+import time
 import httpx
+import orjson
+from functools import lru_cache
+from operator import itemgetter
 from typing import Dict, Any, Optional, List
 from fastapi import HTTPException
 
@@ -11,6 +17,28 @@ from core.logging import get_logger
 
 logger = get_logger(__name__)
 
+# Static request headers, shared by reference instead of rebuilt per call
+_JSON_HEADERS = {'Accept': 'application/json', 'Content-Type': 'application/json'}
+_FORM_HEADERS = {'Content-Type': 'application/x-www-form-urlencoded'}
+
+# Holdings responses are reused for this many seconds per (token, user)
+_HOLDINGS_TTL = 2.0
+
+# Series preference when a symbol trades in several series (EQ > BE > others)
+_SERIES_PRIORITY = {"EQ": 0, "BE": 1}.get
+
+@lru_cache(maxsize=256)
+def _api_secret_hash(api_key: bytes, request_code: str, api_secret: bytes) -> str:
+    """SHA-256 of api_key + request_code + api_secret, memoized for retried request codes"""
+    h = hashlib.sha256(api_key)
+    h.update(request_code.encode())
+    h.update(api_secret)
+    return h.hexdigest()
+
+def _nse(exch_tsym: List[Any]) -> Optional[Dict[str, Any]]:
+    """Return the NSE listing from a holding's exch_tsym list, if any"""
+    return next((s for s in exch_tsym if type(s) is dict and s.get("exch") == "NSE"), None)
+
 class FlattradeClient:
     """Client for Flattrade API operations with enhanced debugging"""
     
@@ -32,7 +60,25 @@ class FlattradeClient:
         self.token_url = self.settings.FLATTRADE_TOKEN_URL
         self.api_key = self.settings.FLATTRADE_API_KEY
         self.api_secret = self.settings.FLATTRADE_API_SECRET
+        self._api_key_bytes = self.api_key.encode()
+        self._api_secret_bytes = self.api_secret.encode()
+        self.default_user_id = self.settings.DEFAULT_USER_ID
         self.timeout = 15.0
+        # Shared pooled client so repeated calls reuse keep-alive connections.
+        # Every call hits the same Flattrade host, so HTTP/2 multiplexes them over one connection.
+        self._client = httpx.AsyncClient(
+            timeout=self.timeout,
+            http2=True,
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=32, keepalive_expiry=60),
+            headers={'Accept-Encoding': 'br, gzip, deflate'}
+        )
+        # Short-lived holdings cache plus in-flight requests, keyed by (token, user_id)
+        self._holdings_cache: Dict[tuple, tuple] = {}
+        self._holdings_inflight: Dict[tuple, asyncio.Task] = {}
+
+    async def aclose(self) -> None:
+        """Close the shared HTTP client"""
+        await self._client.aclose()
     
     def _mask_token(self, token: str) -> str:
         """Mask token for logging purposes"""
@@ -49,41 +95,32 @@ class FlattradeClient:
                 'api_secret': api_secret
             }
             
-            #logger.debug(f"Token URL: {self.token_url}")
-            #logger.debug(f"Request data: {json.dumps(data)}")
-            print(f"Request data: {json.dumps(data)}")
-            print(f"token_url: {self.token_url}")
-            
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(
-                    self.token_url,
-                    headers={
-                        'Accept': 'application/json',
-                        'Content-Type': 'application/json'
-                    },
-                    json=data
+            logger.debug("Exchanging request code at token URL: %s", self.token_url)
+            
+            response = await self._client.post(
+                self.token_url,
+                headers=_JSON_HEADERS,
+                json=data
+            )
+            logger.debug("Token exchange response status: %s", response.status_code)
+            
+            if response.status_code != 200:
+                logger.error(f"Token exchange failed with status {response.status_code}")
+                logger.error(f"Response content: {response.text}")
+                raise HTTPException(
+                    status_code=response.status_code,
+                    detail=f"Token exchange failed: {response.text}"
+                )
+            
+            try:
+                return orjson.loads(response.content)
+            except json.JSONDecodeError as e:
+                logger.error(f"Failed to parse JSON response. Response content: {response.text}")
+                raise HTTPException(
+                    status_code=500,
+                    detail=f"Invalid JSON response from token endpoint: {str(e)}"
                 )
-                print(f"Response : {response}")
-                print(f"Response status code: {response.status_code}")
-                print(f"Response content: {response.text}")
-                
-                if response.status_code != 200:
-                    logger.error(f"Token exchange failed with status {response.status_code}")
-                    logger.error(f"Response content: {response.text}")
-                    raise HTTPException(
-                        status_code=response.status_code,
-                        detail=f"Token exchange failed: {response.text}"
-                    )
                 
-                try:
-                    return response.json()
-                except json.JSONDecodeError as e:
-                    logger.error(f"Failed to parse JSON response. Response content: {response.text}")
-                    raise HTTPException(
-                        status_code=500,
-                        detail=f"Invalid JSON response from token endpoint: {str(e)}"
-                    )
-                    
         except httpx.RequestError as e:
             logger.error(f"HTTP request failed: {str(e)}")
             raise HTTPException(
@@ -99,15 +136,13 @@ class FlattradeClient:
    
     def _create_api_secret_hash(self, request_code: str) -> str:
         """Create SHA-256 hash for API authentication"""
-        combined_str = f"{self.api_key}{request_code}{self.api_secret}"
-        return hashlib.sha256(combined_str.encode()).hexdigest()
+        return _api_secret_hash(self._api_key_bytes, request_code, self._api_secret_bytes)
     
-    def _create_payload(self, data: Dict[str, Any], token: str) -> str:
+    def _create_payload(self, data: Dict[str, Any], token: str) -> bytes:
         """Create payload dict for Flattrade API"""
        
-       # FIXED: Create payload as raw string matching API documentation
-        payload = f'jData={json.dumps(data)}&jKey={token}'
-        return payload
+       # FIXED: Create payload as raw (not URL-encoded) body matching API documentation
+        return b'jData=' + orjson.dumps(data) + b'&jKey=' + token.encode()
    
     def _validate_session_token(self, session_token: str) -> bool:
         """Validate session token format"""
@@ -149,7 +184,7 @@ class FlattradeClient:
             
             # Prepare request data with token number (not symbol)
             data = {
-                "uid": self.settings.DEFAULT_USER_ID,
+                "uid": self.default_user_id,
                 "exch": "NSE", 
                 "token": str(token_number),  # Use token number, not symbol
                 "st": str(start_time),
@@ -158,82 +193,82 @@ class FlattradeClient:
             }
             
             # Create payload in the exact format FlatTrade expects
-            payload = f'jData={json.dumps(data)}&jKey={session_token}'
+            payload = self._create_payload(data, session_token)
             
             logger.info(f"TPSeries request data: {data}")
             logger.info(f"Payload for get_time_price_data: jData={json.dumps(data)}&jKey={masked_token}")
             
             # Make request to FlatTrade API
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    f"{self.base_url}/TPSeries",
-                    headers={'Content-Type': 'application/x-www-form-urlencoded'},
-                    content=payload
+            response = await self._client.post(
+                f"{self.base_url}/TPSeries",
+                headers=_FORM_HEADERS,
+                content=payload,
+                timeout=30.0
+            )
+            
+            logger.info(f"TPSeries response status: {response.status_code}")
+            
+            if response.status_code != 200:
+                logger.error(f"HTTP Error {response.status_code}: {response.text}")
+                raise HTTPException(
+                    status_code=response.status_code,
+                    detail=f"Failed to fetch market data from broker: {response.text}"
                 )
                 
-                logger.info(f"TPSeries response status: {response.status_code}")
+            try:
+                response_data = orjson.loads(response.content)
+            except json.JSONDecodeError as e:
+                logger.error(f"Invalid JSON response: {response.text}")
+                raise HTTPException(
+                    status_code=500,
+                    detail="Invalid response format from broker API"
+                )
+            
+            #logger.info(f"Response data for get_time_price_data: {response_data} and its type is {type(response_data)}")
+            
+            # Check for API errors
+            if isinstance(response_data, dict) and response_data.get("stat") == "Not_Ok":
+                error_msg = response_data.get("emsg", "Unknown error from broker API")
+                logger.error(f"Broker API error: {error_msg}")
                 
-                if response.status_code != 200:
-                    logger.error(f"HTTP Error {response.status_code}: {response.text}")
+                # Handle specific session errors
+                if "session" in error_msg.lower() or "expired" in error_msg.lower() or "invalid" in error_msg.lower():
                     raise HTTPException(
-                        status_code=response.status_code,
-                        detail=f"Failed to fetch market data from broker: {response.text}"
+                        status_code=401,
+                        detail=f"Session validation failed: {error_msg}"
                     )
-                    
-                try:
-                    response_data = response.json()
-                except json.JSONDecodeError as e:
-                    logger.error(f"Invalid JSON response: {response.text}")
+                else:
                     raise HTTPException(
-                        status_code=500,
-                        detail="Invalid response format from broker API"
+                        status_code=400,
+                        detail=f"Broker API error: {error_msg}"
                     )
+            
+            # Handle successful response
+            if isinstance(response_data, list) and len(response_data) > 0:
+                # Transform data into the format needed by frontend
+                chart_data = []
+                for item in response_data:
+                    if isinstance(item, dict):
+                        try:
+                            chart_data.append({
+                                "time": item.get("time"),
+                                "open": float(item.get("into", 0)),
+                                "high": float(item.get("inth", 0)),
+                                "low": float(item.get("intl", 0)),
+                                "close": float(item.get("intc", 0)),
+                                "volume": float(item.get("intv", 0))
+                            })
+                        except (ValueError, TypeError) as e:
+                            logger.warning(f"Error processing candle data: {str(e)}")
+                            continue
                 
-                #logger.info(f"Response data for get_time_price_data: {response_data} and its type is {type(response_data)}")
-                
-                # Check for API errors
-                if isinstance(response_data, dict) and response_data.get("stat") == "Not_Ok":
-                    error_msg = response_data.get("emsg", "Unknown error from broker API")
-                    logger.error(f"Broker API error: {error_msg}")
-                    
-                    # Handle specific session errors
-                    if "session" in error_msg.lower() or "expired" in error_msg.lower() or "invalid" in error_msg.lower():
-                        raise HTTPException(
-                            status_code=401,
-                            detail=f"Session validation failed: {error_msg}"
-                        )
-                    else:
-                        raise HTTPException(
-                            status_code=400,
-                            detail=f"Broker API error: {error_msg}"
-                        )
-                
-                # Handle successful response
-                if isinstance(response_data, list) and len(response_data) > 0:
-                    # Transform data into the format needed by frontend
-                    chart_data = []
-                    for item in response_data:
-                        if isinstance(item, dict):
-                            try:
-                                chart_data.append({
-                                    "time": item.get("time"),
-                                    "open": float(item.get("into", 0)),
-                                    "high": float(item.get("inth", 0)),
-                                    "low": float(item.get("intl", 0)),
-                                    "close": float(item.get("intc", 0)),
-                                    "volume": float(item.get("intv", 0))
-                                })
-                            except (ValueError, TypeError) as e:
-                                logger.warning(f"Error processing candle data: {str(e)}")
-                                continue
-                    
-                    logger.info(f"Successfully processed {len(chart_data)} candles for {symbol}")
-                    chart_data = chart_data[::-1]  # Reverse to chronological order
-                    return chart_data  # Return in chronological order
-                else:
-                    logger.warning(f"Empty or invalid response data for {symbol}")
-                    return []
-                
+                logger.info(f"Successfully processed {len(chart_data)} candles for {symbol}")
+                chart_data = chart_data[::-1]  # Reverse to chronological order
+                return chart_data  # Return in chronological order
+            else:
+                logger.warning(f"Empty or invalid response data for {symbol}")
+                return []
+            
         except HTTPException:
             raise
         except httpx.RequestError as e:
@@ -253,28 +288,28 @@ class FlattradeClient:
         """Test if session token is valid by making a simple API call"""
         try:
             # Use UserDetails as a test call - it's lightweight
-            data = {"uid": self.settings.DEFAULT_USER_ID}
-            payload = f'jData={json.dumps(data)}&jKey={session_token}'
-            
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.post(
-                    f"{self.base_url}/UserDetails",
-                    headers={'Content-Type': 'application/x-www-form-urlencoded'},
-                    content=payload
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    if isinstance(data, dict) and data.get("stat") == "Ok":
-                        logger.info(f"Session token validation successful for user: {data.get('uname', 'Unknown')}")
-                        return True
-                    else:
-                        logger.error(f"Session token validation failed: {data}")
-                        return False
+            data = {"uid": self.default_user_id}
+            payload = self._create_payload(data, session_token)
+            
+            response = await self._client.post(
+                f"{self.base_url}/UserDetails",
+                headers=_FORM_HEADERS,
+                content=payload,
+                timeout=10.0
+            )
+            
+            if response.status_code == 200:
+                data = orjson.loads(response.content)
+                if isinstance(data, dict) and data.get("stat") == "Ok":
+                    logger.info(f"Session token validation successful for user: {data.get('uname', 'Unknown')}")
+                    return True
                 else:
-                    logger.error(f"Session token validation HTTP error: {response.status_code}")
+                    logger.error(f"Session token validation failed: {data}")
                     return False
-                    
+            else:
+                logger.error(f"Session token validation HTTP error: {response.status_code}")
+                return False
+                
         except Exception as e:
             logger.error(f"Error testing session token: {str(e)}")
             return False
@@ -292,50 +327,49 @@ class FlattradeClient:
                 return None
             
             scrip_data = {
-                "uid": self.settings.DEFAULT_USER_ID,
+                "uid": self.default_user_id,
                 "stext": symbol_base,
                 "exch": "NSE"
             }
             
             logger.info(f"market_data for get_stock_token: {scrip_data}")
             
-            payload = f'jData={json.dumps(scrip_data)}&jKey={token}'
+            payload = self._create_payload(scrip_data, token)
             
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                scrip_response = await client.post(
-                    f"{self.base_url}/SearchScrip",
-                    headers={'Content-Type': 'application/x-www-form-urlencoded'},
-                    content=payload
-                )
-                
-                if scrip_response.status_code != 200:
-                    logger.error(f"SearchScrip HTTP error {scrip_response.status_code}: {scrip_response.text}")
-                    return None
-                
-                scrip_info = scrip_response.json()
-                logger.info(f"SearchScrip response: {scrip_info}")
-                
-                if scrip_info.get("stat") != "Ok" or not scrip_info.get("values"):
-                    logger.error(f"Failed to get scrip info for {symbol}: {scrip_info}")
-                    return None
-                
-                # Find the exact symbol match, trying different variations
-                variations = [
-                    f"{symbol_base}-EQ",
-                    symbol_base,
-                    f"{symbol_base}-BE"
-                ]
-                
-                for item in scrip_info["values"]:
-                    item_symbol = item.get("tsym", "")
-                    if item_symbol in variations:
-                        token_result = item.get("token")
-                        logger.info(f"Found token {token_result} for symbol {item_symbol}")
-                        return str(token_result)
-               
-                logger.error(f"[{method_name}] Could not find token number for {symbol}")
+            scrip_response = await self._client.post(
+                f"{self.base_url}/SearchScrip",
+                headers=_FORM_HEADERS,
+                content=payload
+            )
+            
+            if scrip_response.status_code != 200:
+                logger.error(f"SearchScrip HTTP error {scrip_response.status_code}: {scrip_response.text}")
                 return None
-                
+            
+            scrip_info = orjson.loads(scrip_response.content)
+            logger.info(f"SearchScrip response: {scrip_info}")
+            
+            if scrip_info.get("stat") != "Ok" or not scrip_info.get("values"):
+                logger.error(f"Failed to get scrip info for {symbol}: {scrip_info}")
+                return None
+            
+            # Find the exact symbol match, trying different variations
+            variations = [
+                f"{symbol_base}-EQ",
+                symbol_base,
+                f"{symbol_base}-BE"
+            ]
+            
+            for item in scrip_info["values"]:
+                item_symbol = item.get("tsym", "")
+                if item_symbol in variations:
+                    token_result = item.get("token")
+                    logger.info(f"Found token {token_result} for symbol {item_symbol}")
+                    return str(token_result)
+
+            logger.error(f"[{method_name}] Could not find token number for {symbol}")
+            return None
+            
         except Exception as e:
             logger.error(f"[get_stock_token] Failed to get stock token for {symbol}: {str(e)}")
             return None
@@ -345,17 +379,7 @@ class FlattradeClient:
     async def place_order(self, token: str, order_data: Dict[str, Any]) -> Dict[str, Any]:
         """Place a new order"""
         try:
-            endpoint = f"{self.base_url}/placeOrder"
-            payload = self._create_payload(order_data, token)
-            
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(
-                    endpoint,
-                    headers={'Content-Type': 'application/x-www-form-urlencoded'},
-                    content=payload
-                )
-                response.raise_for_status()
-                return response.json()
+            return await self._post_json(f"{self.base_url}/placeOrder", self._create_payload(order_data, token))
         except Exception as e:
             logger.error(f"Failed to place order: {str(e)}")
             raise HTTPException(
@@ -366,61 +390,35 @@ class FlattradeClient:
     async def get_order_history(self, token: str) -> Dict[str, Any]:
         """Get order history"""
         try:
-            endpoint = f"{self.base_url}/OrderBook"
-            #payload = self._create_payload({}, token)
-            uid = "FZ12004"  # Replace with actual user ID as needed
-            data = {"uid": uid}
-            payload = f'jData={json.dumps(data)}&jKey={token}'
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(
-                    endpoint,
-                    headers={'Content-Type': 'application/x-www-form-urlencoded'},
-                    content=payload
-                )
-                response.raise_for_status()
-                
-                if not response.content:
-                    return {"success": True, "data": [], "message": "No orders found"}
-                    
-                return response.json()
+            payload = self._create_payload({"uid": self.default_user_id}, token)
+            response_data = await self._post_json(f"{self.base_url}/OrderBook", payload)
+            if response_data is None:
+                return {"success": True, "data": [], "message": "No orders found"}
+            return response_data
         except Exception as e:
             logger.error(f"Failed to get order history: {str(e)}")
             raise HTTPException(
                 status_code=500,
                 detail=f"Failed to get order history: {str(e)}"
             )
-        """Exchange authorization code for access token"""
-        try:
-            api_secret_hash = self._create_api_secret_hash(request_code)
-            
-            payload = {
-                "api_key": self.api_key,
-                "request_code": request_code,
-                "api_secret": api_secret_hash,
-            }
-            
-            logger.info(f"Exchanging code for token with payload: {payload}")
-            
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                resp = await client.post(self.token_url, json=payload)
-                
-                if resp.status_code >= 400:
-                    logger.error(f"Token exchange failed: {resp.status_code} - {resp.text}")
-                    raise HTTPException(
-                        status_code=resp.status_code,
-                        detail=f"Token exchange failed: {resp.text}"
-                    )
-                
-                token_data = resp.json()
-                logger.info("Token exchange successful")
-                return token_data
-                
-        except HTTPException:
-            raise
-        except Exception as e:
-            logger.error(f"Token exchange error: {str(e)}")
-            raise HTTPException(status_code=502, detail=f"Token exchange error: {str(e)}")
-        
+
+    async def _post_json(self, url: str, payload: bytes, headers: Dict[str, str] = _FORM_HEADERS) -> Any:
+        """POST a jData payload and return the decoded JSON body, or None if the body is empty"""
+        resp = await self._client.post(url, content=payload, headers=headers)
+        logger.info(f"API response: {resp.status_code}")
+
+        if resp.status_code >= 400:
+            logger.error(f"API call failed: {resp.status_code} - {resp.text}")
+            raise HTTPException(
+                status_code=resp.status_code,
+                detail=f"Flattrade API error: {resp.text}"
+            )
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"{url}: {resp.num_bytes_downloaded} bytes on the wire, {len(resp.content)} decoded")
+
+        return orjson.loads(resp.content) if resp.content else None
+
     async def make_api_call(
         self, 
         endpoint: str, 
@@ -434,120 +432,134 @@ class FlattradeClient:
             logger.debug(f"Making API call to: {url}")
             
             if data is None:
-                data = {"uid": self.settings.DEFAULT_USER_ID}
+                data = {"uid": self.default_user_id}
             
             payload = self._create_payload(data, token)
-            headers = {'Content-Type': 'application/json'}
             
             logger.info(f"Making API call to {endpoint}")
             
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                if method.upper() == "POST":
-                    resp = await client.post(url, content=payload, headers=headers)
-                else:
-                    resp = await client.get(url, headers=headers)
-                
+            if method.upper() == "POST":
+                response_data = await self._post_json(url, payload, _JSON_HEADERS)
+            else:
+                resp = await self._client.get(url, headers=_JSON_HEADERS)
                 logger.info(f"API response: {resp.status_code}")
-                
                 if resp.status_code >= 400:
                     logger.error(f"API call failed: {resp.status_code} - {resp.text}")
                     raise HTTPException(
                         status_code=resp.status_code,
                         detail=f"Flattrade API error: {resp.text}"
                     )
-                
-                response_data = resp.json()
-                #print('response_data-->', response_data)
-                
-                # Handle "no data" error response
-                if (isinstance(response_data, dict) and 
-                    response_data.get("stat") == "Not_Ok" and 
-                    "no data" in response_data.get("emsg", "").lower()):
-                    return {"success": True, "data": [], "message": "No data available"}
-                
-                # Handle error response
-                if isinstance(response_data, dict) and response_data.get("stat") == "Not_Ok":
-                    raise HTTPException(
-                        status_code=400,
-                        detail=response_data.get("emsg", "API call failed")
-                    )
-                
-                return response_data
-                
+                response_data = orjson.loads(resp.content)
+            
+            # Handle "no data" error response
+            if (type(response_data) is dict and 
+                response_data.get("stat") == "Not_Ok" and 
+                "no data" in response_data.get("emsg", "").lower()):
+                return {"success": True, "data": [], "message": "No data available"}
+            
+            # Handle error response
+            if type(response_data) is dict and response_data.get("stat") == "Not_Ok":
+                raise HTTPException(
+                    status_code=400,
+                    detail=response_data.get("emsg", "API call failed")
+                )
+            
+            return response_data
+            
         except HTTPException:
             raise
         except Exception as e:
             logger.error(f"API call failed for {endpoint}: {str(e)}")
             raise HTTPException(status_code=500, detail=str(e))
+    @staticmethod
+    def _parse_holding(holding: Dict[str, Any], nse_symbol: Dict[str, Any]) -> Optional[tuple]:
+        """Extract (tsym, quantity, entry_price, product) from a raw holding, or None to skip it"""
+        try:
+            # Quantity: netqty (incl. T1 holdings), then npoadqty (open adjusted), then dayqty (intraday)
+            total_qty = int(
+                float(holding.get("netqty") or 0)
+                or float(holding.get("npoadqty") or 0)
+                or float(holding.get("dayqty") or 0)
+            )
+            if total_qty <= 0:
+                return None
+
+            # Entry price: avgprc, then upldprc, then the other possible price fields
+            entry_price = (
+                float(holding.get("avgprc") or holding.get("upldprc") or 0)
+                or float(holding.get("buyavgprc") or holding.get("bep") or 0)
+            )
+
+            return str(nse_symbol.get("tsym", "")), total_qty, entry_price, str(holding.get("s_prdt_ali", "CNC"))
+        except (TypeError, ValueError) as e:
+            logger.error(f"Error processing holding: {e}")
+            return None
+
     async def get_holdings(self, token: str, user_id: Optional[str] = None) -> Dict[str, Any]:
+        """Get portfolio holdings, reusing a fresh result and sharing concurrent fetches"""
+        key = (token, user_id)
+        cached = self._holdings_cache.get(key)
+        if cached and time.monotonic() - cached[0] < _HOLDINGS_TTL:
+            return cached[1]
+        task = self._holdings_inflight.get(key)
+        if task is None:
+            task = self._holdings_inflight[key] = asyncio.create_task(self._load_holdings(token, user_id))
+        # Shield so one caller being cancelled does not cancel the shared request
+        return await asyncio.shield(task)
+
+    async def _load_holdings(self, token: str, user_id: Optional[str]) -> Dict[str, Any]:
+        """Fetch holdings once and cache successful responses"""
+        key = (token, user_id)
+        try:
+            response = await self._fetch_holdings(token, user_id)
+        finally:
+            self._holdings_inflight.pop(key, None)
+        if response.get("success") is True:
+            now = time.monotonic()
+            # Drop expired entries so stale sessions do not accumulate
+            expired = [k for k, (ts, _) in self._holdings_cache.items() if now - ts >= _HOLDINGS_TTL]
+            for k in expired:
+                del self._holdings_cache[k]
+            self._holdings_cache[key] = (now, response)
+        return response
+
+    async def _fetch_holdings(self, token: str, user_id: Optional[str]) -> Dict[str, Any]:
         """Get portfolio holdings"""
         try:
             data = {
-                "uid": user_id or self.settings.DEFAULT_USER_ID,
-                "actid": user_id or self.settings.DEFAULT_USER_ID,
+                "uid": user_id or self.default_user_id,
+                "actid": user_id or self.default_user_id,
                 "prd": "C"
             }
             response = await self.make_api_call("/Holdings", token, data)
-            #logger.debug(f"Raw holdings response: {response}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Raw holdings response: {response}")
             
             # Transform the Flattrade response to match our frontend structure
             transformed_holdings = []
             
-            if isinstance(response, list):
-                for holding_data in response:
-                    try:
-                        # Ensure we're working with a dictionary
-                        if not isinstance(holding_data, dict):
-                            continue
-                            
-                        holding: Dict[str, Any] = holding_data
-                            
-                        # Extract NSE symbol details
-                        exch_tsym_data = holding.get("exch_tsym", [])
-                        if not isinstance(exch_tsym_data, list):
-                            continue
-                            
-                        # Find NSE symbol in exchange list
-                        nse_symbol = None
-                        for sym in exch_tsym_data:
-                            if isinstance(sym, dict) and sym.get("exch") == "NSE":
-                                nse_symbol = sym
-                                break
-                        
-                        if not nse_symbol:
-                            continue
-                            
-                        # Get quantities with proper type handling
-                        # Use npoadqty for Net Position Open Adjusted Quantity
-                        npoadqty = float(holding.get("npoadqty", "0") or "0")
-                        # Use netqty for Net Quantity including T1 holdings
-                        netqty = float(holding.get("netqty", "0") or "0")
-                        # Use dayqty for intraday positions
-                        dayqty = float(holding.get("dayqty", "0") or "0")
-                        
-                        # Calculate total quantity (use netqty as primary source)
-                        total_qty = int(netqty or npoadqty or dayqty)
-                        
-                        if total_qty <= 0:
-                            continue
-                            
-                        # Get average price for entry price calculation
-                        try:
-                            # Use avgprc (Average Price) if available, fallback to upldprc (Upload Price)
-                            entry_price = float(holding.get("avgprc") or holding.get("upldprc") or "0")
-                            if entry_price == 0:
-                                # Try other possible price fields
-                                entry_price = float(holding.get("buyavgprc") or holding.get("bep") or "0")
-                        except (ValueError, TypeError):
-                            entry_price = 0.0
-                            
-                        # Get real-time price using GetQuotes endpoint
-                        quote_symbol = str(nse_symbol.get("tsym", ""))
-                        current_price = entry_price  # Initialize with entry price as fallback
-                        
+            if type(response) is list:
+                # Filter once and resolve every holding's NSE listing up front
+                holdings = [
+                    h for h in response
+                    if type(h) is dict and type(h.get("exch_tsym", [])) is list
+                ]
+                nse_symbols = [_nse(h.get("exch_tsym", [])) for h in holdings]
+                parsed_holdings = [
+                    parsed for parsed in (
+                        self._parse_holding(holding, nse_symbol)
+                        for holding, nse_symbol in zip(holdings, nse_symbols) if nse_symbol
+                    )
+                    if parsed
+                ]
+
+                for quote_symbol, total_qty, entry_price, product in parsed_holdings:
+                    current_price = entry_price  # Initialize with entry price as fallback
+
+                    # P&L is 0 without an entry price, so skip the SearchScrip+GetQuotes round-trip
+                    if entry_price > 0 and total_qty > 0:
                         try:
                             live_price = await self.get_live_price(token, quote_symbol)
-                            print(f"Live price for {quote_symbol} is {live_price}")
                             if live_price is not None and live_price > 0:
                                 current_price = live_price
                                 logger.info(f"Got live price for {quote_symbol}: {current_price}")
@@ -557,24 +569,19 @@ class FlattradeClient:
                             logger.error(f"Failed to get live price for {quote_symbol}: {str(e)}")
                             logger.warning(f"Using entry price as fallback for {quote_symbol} due to error")
 
-                        # Calculate P&L
-                        pnl = (current_price - entry_price) * total_qty if total_qty > 0 and current_price > 0 and entry_price > 0 else 0.0
+                    # Calculate P&L
+                    pnl = (current_price - entry_price) * total_qty if total_qty > 0 and current_price > 0 and entry_price > 0 else 0.0
 
-                        transformed_holding = {
-                            "symbol": quote_symbol.replace("-EQ", "").replace("-BE", ""),
-                            "quantity": total_qty,
-                            "side": "LONG",  # Holdings are always long positions
-                            "entry_price": entry_price,
-                            "current_price": current_price,
-                            "pnl": pnl,
-                            "exchange": "NSE",
-                            "product": str(holding.get("s_prdt_ali", "CNC"))
-                        }
-                        transformed_holdings.append(transformed_holding)
-                        
-                    except Exception as e:
-                        logger.error(f"Error processing holding: {e}")
-                        continue
+                    transformed_holdings.append({
+                        "symbol": quote_symbol.replace("-EQ", "").replace("-BE", ""),
+                        "quantity": total_qty,
+                        "side": "LONG",  # Holdings are always long positions
+                        "entry_price": entry_price,
+                        "current_price": current_price,
+                        "pnl": pnl,
+                        "exchange": "NSE",
+                        "product": product
+                    })
                         
             return {
                 "success": True,
@@ -590,19 +597,19 @@ class FlattradeClient:
             }
     async def get_order_book(self, token: str, user_id: Optional[str] = None) -> Dict[str, Any]:
         """Get order book"""
-        data = {"uid": user_id or self.settings.DEFAULT_USER_ID}
+        data = {"uid": user_id or self.default_user_id}
         return await self.make_api_call("/OrderBook", token, data)
     
     async def get_trade_book(self, token: str, user_id: Optional[str] = None) -> Dict[str, Any]:
         """Get trade book"""
         data = {
-            "uid": user_id or self.settings.DEFAULT_USER_ID,
-            "actid": user_id or self.settings.DEFAULT_USER_ID
+            "uid": user_id or self.default_user_id,
+            "actid": user_id or self.default_user_id
         }
         return await self.make_api_call("/TradeBook", token, data)
     async def get_user_details(self, token: str, user_id: Optional[str] = None) -> Dict[str, Any]:
         """Get user account details"""
-        data = {"uid": user_id or self.settings.DEFAULT_USER_ID}
+        data = {"uid": user_id or self.default_user_id}
         response = await self.make_api_call("/UserDetails", token, data)
         
         if isinstance(response, dict) and response.get("stat") == "Ok":
@@ -629,6 +636,26 @@ class FlattradeClient:
             }
         
         return {"success": False, "account": None, "error": "Failed to fetch user details"}
+
+    async def get_dashboard(self, token: str, user_id: Optional[str] = None) -> Dict[str, Any]:
+        """Fetch holdings, order book, trade book and user details concurrently"""
+        keys = ("holdings", "orders", "trades", "user")
+        results = await asyncio.gather(
+            self.get_holdings(token, user_id),
+            self.get_order_book(token, user_id),
+            self.get_trade_book(token, user_id),
+            self.get_user_details(token, user_id),
+            return_exceptions=True
+        )
+
+        # One failed call should not blank the whole dashboard
+        dashboard = {}
+        for key, result in zip(keys, results):
+            if isinstance(result, Exception):
+                logger.error(f"Failed to fetch {key} for dashboard: {str(result)}")
+                result = {"success": False, "data": None, "error": getattr(result, "detail", str(result))}
+            dashboard[key] = result
+        return dashboard
     async def get_live_price(self, token: str, symbol: str) -> Optional[float]:
         """Get real-time last traded price (LTP) for a symbol
         
@@ -645,25 +672,24 @@ class FlattradeClient:
                 return None
                 
             market_data = {
-                "uid": self.settings.DEFAULT_USER_ID,
+                "uid": self.default_user_id,
                 "exch": "NSE",
                 "token": token_number
             }
             #print(f"market_data for live price: {market_data}")
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(
-                    f"{self.base_url}/GetQuotes",
-                    headers={'Content-Type': 'application/x-www-form-urlencoded'},
-                    content=self._create_payload(market_data, token)
-                )
-                response.raise_for_status()
-                
-                data = response.json()
-                #print(f"Live price response data: {data} and its type is {type(data)}")
-                if data.get("stat") == "Ok":
-                    return float(data.get("lp")) if data.get("lp") else data.get("lp")
-                
-                
+            response = await self._client.post(
+                f"{self.base_url}/GetQuotes",
+                headers=_FORM_HEADERS,
+                content=self._create_payload(market_data, token)
+            )
+            response.raise_for_status()
+            
+            data = orjson.loads(response.content)
+            #print(f"Live price response data: {data} and its type is {type(data)}")
+            if data.get("stat") == "Ok":
+                return float(data.get("lp")) if data.get("lp") else data.get("lp")
+            
+            
         except Exception as e:
             logger.error(f"Failed to get live price for {symbol}: {str(e)}")
             return None
@@ -679,78 +705,77 @@ class FlattradeClient:
                 
             # Now get the market data using the token number
             market_data = {
-                "uid": self.settings.DEFAULT_USER_ID,
+                "uid": self.default_user_id,
                 "stext": symbol_base,
                 "exch": "NSE"
             }
             print(f"market_data for get_market_data: {market_data}")
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                # Get scrip details first
-                scrip_response = await client.post(
-                    f"{self.base_url}/SearchScrip",
-                    headers={'Content-Type': 'application/x-www-form-urlencoded'},
-                    content=self._create_payload(market_data, token)
-                )
-                scrip_response.raise_for_status()
-                scrip_info = scrip_response.json()
-                print(f"scrip_info: {scrip_info}")
-                
-                if scrip_info.get("stat") != "Ok" or not scrip_info.get("values"):
-                    logger.error(f"Failed to get scrip info for {symbol}")
-                    return None
-                
-                # Find the exact symbol match, trying different variations
-                token_number = None
-                variations = [
-                    f"{symbol_base}-EQ",
-                    symbol_base,
-                    f"{symbol_base}-BE"
-                ]
-                
-                for item in scrip_info["values"]:
-                    if item.get("tsym") in variations:
-                        token_number = item.get("token")
-                        break
-                
-                if not token_number:
-                    method_name = inspect.currentframe().f_code.co_name  # type: ignore
-                    logger.error(f"[{method_name}]Could not find token number for {symbol},")
-                    return None
-                
-                # Now get the market data using the token number
-                quotes_market_data = {
-                    "uid": self.settings.DEFAULT_USER_ID,
-                    "exch": "NSE",
-                    "token": token_number
-                }
-                
-                print(f"quotes_market_data for get_market_data: {quotes_market_data}")  
-                response = await client.post(
-                    f"{self.base_url}/GetQuotes",
-                    headers={'Content-Type': 'application/x-www-form-urlencoded'},
-                    content=self._create_payload(quotes_market_data, token)
-                )
-               
-                response.raise_for_status()
-                response_data = response.json()
-                
-                print(f"response for quotes_market_data: {response_data} and stsat: {response_data.get('stat')}")
-                if response_data.get("stat") == "Ok":
-                     return {
-                            "symbol": symbol.replace("-EQ", ""),
-                            "token": token_number,
-                            "ltp": float(response_data.get("lp", 0)),
-                            "ltq": int(response_data.get("ltq", 0)),
-                            "ltt": response_data.get("ltt"),
-                            "open": float(response_data.get("o", 0)),
-                            "high": float(response_data.get("h", 0)),
-                            "low": float(response_data.get("l", 0)),
-                            "close": float(response_data.get("c", 0)),
-                            "volume": int(response_data.get("v", 0)),
-                            "average_price": float(response_data.get("ap", 0))
-                        }
+            # Get scrip details first
+            scrip_response = await self._client.post(
+                f"{self.base_url}/SearchScrip",
+                headers=_FORM_HEADERS,
+                content=self._create_payload(market_data, token)
+            )
+            scrip_response.raise_for_status()
+            scrip_info = orjson.loads(scrip_response.content)
+            print(f"scrip_info: {scrip_info}")
+            
+            if scrip_info.get("stat") != "Ok" or not scrip_info.get("values"):
+                logger.error(f"Failed to get scrip info for {symbol}")
                 return None
-                
+            
+            # Find the exact symbol match, trying different variations
+            token_number = None
+            variations = [
+                f"{symbol_base}-EQ",
+                symbol_base,
+                f"{symbol_base}-BE"
+            ]
+            
+            for item in scrip_info["values"]:
+                if item.get("tsym") in variations:
+                    token_number = item.get("token")
+                    break
+            
+            if not token_number:
+                method_name = inspect.currentframe().f_code.co_name  # type: ignore
+                logger.error(f"[{method_name}]Could not find token number for {symbol},")
+                return None
+            
+            # Now get the market data using the token number
+            quotes_market_data = {
+                "uid": self.default_user_id,
+                "exch": "NSE",
+                "token": token_number
+            }
+            
+            print(f"quotes_market_data for get_market_data: {quotes_market_data}")  
+            response = await self._client.post(
+                f"{self.base_url}/GetQuotes",
+                headers=_FORM_HEADERS,
+                content=self._create_payload(quotes_market_data, token)
+            )
+
+            response.raise_for_status()
+            response_data = orjson.loads(response.content)
+            
+            print(f"response for quotes_market_data: {response_data} and stsat: {response_data.get('stat')}")
+            if response_data.get("stat") == "Ok":
+                 return {
+                        "symbol": symbol.replace("-EQ", ""),
+                        "token": token_number,
+                        "ltp": float(response_data.get("lp", 0)),
+                        "ltq": int(response_data.get("ltq", 0)),
+                        "ltt": response_data.get("ltt"),
+                        "open": float(response_data.get("o", 0)),
+                        "high": float(response_data.get("h", 0)),
+                        "low": float(response_data.get("l", 0)),
+                        "close": float(response_data.get("c", 0)),
+                        "volume": int(response_data.get("v", 0)),
+                        "average_price": float(response_data.get("ap", 0))
+                    }
+            return None
+            
         except Exception as e:
             logger.error(f"Failed to get market data for {symbol}: {str(e)}")
             return None
@@ -805,73 +830,60 @@ class FlattradeClient:
         """
         try:
             scrip_data = {
-                "uid": self.settings.DEFAULT_USER_ID,
+                "uid": self.default_user_id,
                 "stext": query.upper(),
                 "exch": "NSE"
             }
             
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(
-                    f"{self.base_url}/SearchScrip",
-                    headers={'Content-Type': 'application/x-www-form-urlencoded'},
-                    content=self._create_payload(scrip_data, token)
-                )
-                response.raise_for_status()
-                
-                data = response.json()
-                
-                if data.get("stat") != "Ok":
-                    logger.error(f"Symbol search failed: {data.get('emsg', 'Unknown error')}")
-                    return []
-                    
-                # Transform the response to a more friendly format with additional trading parameters
-                symbols = []
-                symbols_by_base = {}  # Group symbols by their base name for series preference
-                
-                # First pass: group symbols by their base name
-                for item in data.get("values", []):
-                    base_symbol = item.get("symname", "")
-                    tsym = item.get("tsym", "")
-                    series = tsym.split("-")[-1] if "-" in tsym else "EQ"
-                    
-                    symbol_info = {
-                        "symbol": base_symbol,
-                        "display_name": tsym,  # Full symbol with series
-                        "name": item.get("cname", ""),
-                        "token": item.get("token", ""),
-                        "exchange": item.get("exch", "NSE"),
-                        "series": series,
-                        "instrument": item.get("instname", ""),
-                        "lot_size": int(item.get("ls", "1")),
-                        "tick_size": float(item.get("ti", "0.05")),
-                        "price_precision": int(item.get("pp", "2")),
-                    }
-                    
-                    if base_symbol not in symbols_by_base:
-                        symbols_by_base[base_symbol] = []
-                    symbols_by_base[base_symbol].append(symbol_info)
-                
-                # Second pass: select preferred series for each symbol
-                for base_symbol, variants in symbols_by_base.items():
-                    # Sort variants by series preference (EQ > BE > others)
-                    def series_priority(symbol):
-                        series = symbol["series"]
-                        if series == "EQ":
-                            return 0
-                        elif series == "BE":
-                            return 1
-                        else:
-                            return 2
-                    
-                    sorted_variants = sorted(variants, key=series_priority)
-                    # Take the preferred variant (first after sorting)
-                    if sorted_variants:
-                        symbols.append(sorted_variants[0])
+            response = await self._client.post(
+                f"{self.base_url}/SearchScrip",
+                headers=_FORM_HEADERS,
+                content=self._create_payload(scrip_data, token)
+            )
+            response.raise_for_status()
+            
+            data = orjson.loads(response.content)
+            
+            if data.get("stat") != "Ok":
+                logger.error(f"Symbol search failed: {data.get('emsg', 'Unknown error')}")
+                return []
                 
-                # Sort final list by symbol name
-                symbols.sort(key=lambda x: x["symbol"])
-                return symbols
+            # Transform the response to a more friendly format with additional trading parameters
+            symbols = []
+            symbols_by_base = {}  # Group symbols by their base name for series preference
+            
+            # First pass: group symbols by their base name
+            for item in data.get("values", []):
+                base_symbol = item.get("symname", "")
+                tsym = item.get("tsym", "")
+                series = tsym.split("-")[-1] if "-" in tsym else "EQ"
+                
+                symbol_info = {
+                    "symbol": base_symbol,
+                    "display_name": tsym,  # Full symbol with series
+                    "name": item.get("cname", ""),
+                    "token": item.get("token", ""),
+                    "exchange": item.get("exch", "NSE"),
+                    "series": series,
+                    "instrument": item.get("instname", ""),
+                    "lot_size": int(item.get("ls", "1")),
+                    "tick_size": float(item.get("ti", "0.05")),
+                    "price_precision": int(item.get("pp", "2")),
+                }
                 
+                if base_symbol not in symbols_by_base:
+                    symbols_by_base[base_symbol] = []
+                symbols_by_base[base_symbol].append(symbol_info)
+            
+            # Second pass: select the preferred series for each symbol
+            for variants in symbols_by_base.values():
+                if variants:
+                    symbols.append(min(variants, key=lambda v: _SERIES_PRIORITY(v["series"], 2)))
+            
+            # Sort final list by symbol name
+            symbols.sort(key=itemgetter("symbol"))
+            return symbols
+            
         except httpx.RequestError as e:
             logger.error(f"HTTP request failed during symbol search: {str(e)}")
             raise HTTPException(
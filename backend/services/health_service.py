@@ -1,6 +1,7 @@
 
 # services/health_service.py
-from datetime import datetime
+import time
+from datetime import datetime, timezone
 from typing import Dict, Any
 from fastapi import HTTPException
 import httpx
@@ -14,6 +15,16 @@ class api_health_service:
     def __init__(self):
         self.start_time = datetime.utcnow()
         self.settings = get_settings()
+        # Shared client so frequent health probes reuse the upstream connection
+        self._client = httpx.AsyncClient(timeout=5.0)
+        # Last health check result, reused for _cache_ttl seconds
+        self._cache = None
+        self._cache_ts = 0.0
+        self._cache_ttl = 5.0
+
+    async def aclose(self) -> None:
+        """Close the shared HTTP client"""
+        await self._client.aclose()
 
     async def initialize(self):
         try:
@@ -26,13 +37,21 @@ class api_health_service:
                 detail=f"Failed to initialize HealthService: {str(e)}"
             )
     async def _flattrade_health_check(self):
-    
+        # Probes poll far more often than upstream health changes; serve recent results
+        if self._cache and time.monotonic() - self._cache_ts < self._cache_ttl:
+            return self._cache
+        result = await self._check_flattrade()
+        self._cache, self._cache_ts = result, time.monotonic()
+        return result
+
+    async def _check_flattrade(self):
+        ts = datetime.now(timezone.utc).isoformat()
         try:
             if not self.settings.FLATTRADE_API_KEY or not self.settings.FLATTRADE_API_SECRET:
                 return {
                     "status": "unconfigured",
                     "message": "Flattrade API credentials not configured",
-                    "timestamp": datetime.utcnow().isoformat(),
+                    "timestamp": ts,
                     "version": "1.0.0",
                     "missing": [
                         "FLATTRADE_API_KEY" if not self.settings.FLATTRADE_API_KEY else None,
@@ -44,31 +63,30 @@ class api_health_service:
                 return {
                     "status": "unconfigured",
                     "message": "Flattrade token URL not configured",
-                    "timestamp": datetime.utcnow().isoformat(),
+                    "timestamp": ts,
                     "version": "1.0.0",
                     "missing": ["FLATTRADE_TOKEN_URL"]
                 }
             
             # Try to make a simple API call to check connectivity
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                resp = await client.get(f"{self.settings.FLATTRADE_BASE_URL}/health")
-                return {
-                    "status": "connected" if resp.status_code == 200 else "error",
-                    "flattrade_status": resp.status_code,
-                    "message": "Flattrade API is accessible" if resp.status_code == 200 else f"Flattrade API returned {resp.status_code}",
-                    "timestamp": datetime.utcnow().isoformat(),
-                    "version": "1.0.0",
-                    "config": {
-                        "base_url": self.settings.FLATTRADE_BASE_URL,
-                        "token_url": self.settings.FLATTRADE_TOKEN_URL,
-                        "redirect_uri": self.settings.FLATTRADE_REDIRECT_URI
-                    }
+            resp = await self._client.get(f"{self.settings.FLATTRADE_BASE_URL}/health")
+            return {
+                "status": "connected" if resp.status_code == 200 else "error",
+                "flattrade_status": resp.status_code,
+                "message": "Flattrade API is accessible" if resp.status_code == 200 else f"Flattrade API returned {resp.status_code}",
+                "timestamp": ts,
+                "version": "1.0.0",
+                "config": {
+                    "base_url": self.settings.FLATTRADE_BASE_URL,
+                    "token_url": self.settings.FLATTRADE_TOKEN_URL,
+                    "redirect_uri": self.settings.FLATTRADE_REDIRECT_URI
                 }
+            }
         except Exception as e:
             return {
                 "status": "error",
                 "message": f"Failed to connect to Flattrade API: {str(e)}",
-                "timestamp": datetime.utcnow().isoformat(),
+                "timestamp": ts,
                 "version": "1.0.0",
                 "config": {
                     "base_url": self.settings.FLATTRADE_BASE_URL,
@@ -1,41 +1,145 @@
 # services/portfolio_service.py
 from typing import List, Dict, Any, Optional, Union
 import httpx
-import json
+import orjson
+import math
 import socket
+import time
 from fastapi import HTTPException
+from pydantic import TypeAdapter, ValidationError
 from datetime import datetime, timedelta
+from functools import lru_cache
 import pandas as pd
 import numpy as np
 
 from models.schemas import Position, PortfolioStats, OrderRequest, OrderResponse, OrderHistoryItem
 from services.flattrade_client import flattrade_client
 from core.logging import get_logger
+from utils.helpers import calculate_positions_pnl_batch
 
 logger = get_logger(__name__)
 
+# Portfolios at least this large use the NumPy path in calculate_portfolio_stats;
+# below this the fused Python loop wins, since np.fromiter still walks every position
+_SOA_MIN_POSITIONS = 500
+
+_FORM_HEADERS = {'Content-Type': 'application/x-www-form-urlencoded'}
+
+# Internal <-> Flattrade order type codes
+_ORDER_TYPE_MAP = {
+    "MARKET": "MKT",
+    "LIMIT": "LMT",
+    "SL": "SL-LMT",
+    "SL-M": "SL-MKT"
+}
+_ORDER_TYPE_REV = {v: k for k, v in _ORDER_TYPE_MAP.items()}
+
+# Flattrade transaction type -> order side; anything other than "B" is a sell
+_SIDE_MAP = {"B": "BUY"}
+
+# Generator for the synthetic performance series; avoids the legacy global RNG lock
+_RNG = np.random.default_rng()
+
+# Synthetic performance series keyed on (total value, total P&L, days), reused for a short TTL
+_PERF_CACHE: Dict[tuple, tuple] = {}
+_PERF_CACHE_TTL = 60.0
+_PERF_CACHE_MAX = 256
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional
+    njit = None
+
+if njit is not None:
+    @njit(cache=True, fastmath=True)
+    def _synthesize(days, base_total_value, base_total_pnl, noise):
+        """Daily total value, total P&L and day P&L for the synthetic performance series"""
+        totals = np.empty(days)
+        pnls = np.empty(days)
+        day_pnls = np.empty(days)
+        prev = 0.0
+        for i in range(days):
+            # Smooth 0.5% sine wave plus the supplied random component
+            dc = 1.0 + math.sin(i / 10.0) * 0.005 + noise[i]
+            p = base_total_pnl * dc
+            totals[i] = base_total_value * dc
+            pnls[i] = p
+            day_pnls[i] = p - prev
+            prev = p
+        return totals, pnls, day_pnls
+else:
+    # Without numba a per-day Python loop is far slower than whole-array NumPy ops
+    def _synthesize(days, base_total_value, base_total_pnl, noise):
+        """Daily total value, total P&L and day P&L for the synthetic performance series"""
+        # Smooth 0.5% sine wave plus the supplied random component
+        daily_change = 1.0 + np.sin(np.arange(days) / 10.0) * 0.005 + noise
+        pnls = base_total_pnl * daily_change
+        return base_total_value * daily_change, pnls, np.diff(pnls, prepend=0.0)
+
+# Validates a whole list of standardized holdings in one pydantic-core call
+_POSITION_LIST_ADAPTER = TypeAdapter(List[Position])
+
+# Fields that mark a holding as already in the standardized format
+_NEW_FORMAT_KEYS = ('symbol', 'quantity', 'entry_price', 'current_price', 'pnl')
+
+@lru_cache(maxsize=4096)
+def _parse_noren_ts(raw_ts: str) -> Optional[datetime]:
+    """Parse a Noren order timestamp like "08:38:15 30-08-2025", or None if malformed"""
+    # Fixed-width "HH:MM:SS DD-MM-YYYY" is sliced directly; strptime handles anything else
+    if len(raw_ts) == 19 and raw_ts[2] == raw_ts[5] == ":" and raw_ts[11] == raw_ts[14] == "-":
+        try:
+            return datetime(int(raw_ts[15:19]), int(raw_ts[12:14]), int(raw_ts[9:11]),
+                            int(raw_ts[0:2]), int(raw_ts[3:5]), int(raw_ts[6:8]))
+        except ValueError:
+            return None
+    try:
+        return datetime.strptime(raw_ts, "%H:%M:%S %d-%m-%Y")
+    except ValueError:
+        return None
+
+# Shared order-placement client, created on first use so orders reuse warm connections
+_CLIENT: Optional[httpx.AsyncClient] = None
+
+async def _get_client() -> httpx.AsyncClient:
+    """Return the shared order-placement client, creating it on first use"""
+    global _CLIENT
+    if _CLIENT is None:
+        _CLIENT = httpx.AsyncClient(
+            timeout=httpx.Timeout(30.0, connect=3.0),
+            # Limits must be set on the transport: a custom transport ignores the client-level ones
+            transport=httpx.AsyncHTTPTransport(
+                retries=3,
+                http2=True,
+                limits=httpx.Limits(max_connections=32, max_keepalive_connections=16, keepalive_expiry=60)
+            ),
+            follow_redirects=True,
+            headers={
+                'User-Agent': 'Mozilla/5.0',  # Add user agent to prevent blocking
+                'Accept': 'application/json',
+                'Accept-Encoding': 'br, gzip, deflate'
+            }
+        )
+    return _CLIENT
+
 class PortfolioService:
     """Service for portfolio operations"""
 
-    def _map_order_type(self, order_type: str) -> str:
+    async def aclose(self) -> None:
+        """Close the shared order-placement client"""
+        global _CLIENT
+        if _CLIENT is not None:
+            await _CLIENT.aclose()
+            _CLIENT = None
+
+    @staticmethod
+    def _map_order_type(order_type: str) -> str:
         """Map internal order types to Flattrade order types"""
-        mapping = {
-            "MARKET": "MKT",
-            "LIMIT": "LMT",
-            "SL": "SL-LMT",
-            "SL-M": "SL-MKT"
-        }
-        return mapping.get(order_type, "MKT")
+        return _ORDER_TYPE_MAP.get(order_type, "MKT")
 
-    def _reverse_map_order_type(self, ft_order_type: str) -> str:
+    @staticmethod
+    def _reverse_map_order_type(ft_order_type: str) -> str:
         """Map Flattrade order types to internal order types"""
-        mapping = {
-            "MKT": "MARKET",
-            "LMT": "LIMIT",
-            "SL-LMT": "SL",
-            "SL-MKT": "SL-M"
-        }
-        return mapping.get(ft_order_type, "MARKET")
+        return _ORDER_TYPE_REV.get(ft_order_type, "MARKET")
 
     async def get_historical_performance(self, session_token: str, days: int = 30) -> List[Dict[str, Any]]:
         """Get historical portfolio performance"""
@@ -47,7 +151,7 @@ class PortfolioService:
                 # Try to get current holdings first
                 current_holdings = await self.get_holdings(session_token)
             except Exception as e:
-                logger.warning(f"Failed to get current holdings: {str(e)}")
+                logger.warning("Failed to get current holdings: %s", e)
                 # Return empty performance data if we can't get holdings
                 return []
 
@@ -57,32 +161,54 @@ class PortfolioService:
             # If we have holdings, generate historical data
             if current_holdings:
                 # Calculate base values from current holdings
-                base_total_value = sum(h.current_price * h.quantity for h in current_holdings)
-                base_total_pnl = sum((h.current_price - h.entry_price) * h.quantity for h in current_holdings)
+                n = len(current_holdings)
+                if n >= _SOA_MIN_POSITIONS:
+                    qty = np.fromiter((h.quantity for h in current_holdings), dtype=np.float64, count=n)
+                    avg = np.fromiter((h.entry_price for h in current_holdings), dtype=np.float64, count=n)
+                    cur = np.fromiter((h.current_price for h in current_holdings), dtype=np.float64, count=n)
+                    base_total_value = float((cur * qty).sum())
+                    base_total_pnl = float(calculate_positions_pnl_batch(qty, avg, cur).sum())
+                else:
+                    base_total_value = sum(h.current_price * h.quantity for h in current_holdings)
+                    base_total_pnl = sum((h.current_price - h.entry_price) * h.quantity for h in current_holdings)
+
+                # Repeated dashboard polls reuse the same series while holdings are unchanged
+                cache_key = (round(base_total_value, 2), round(base_total_pnl, 2), days)
+                now = time.monotonic()
+                cached = _PERF_CACHE.get(cache_key)
+                if cached and now - cached[0] < _PERF_CACHE_TTL:
+                    return cached[1]
+
+                # Sine wave plus a small 0.2% random component.
+                # This creates more realistic looking data than pure random
+                totals, pnls, day_pnls = _synthesize(
+                    days, float(base_total_value), float(base_total_pnl), _RNG.normal(0.0, 0.002, size=days)
+                )
+                # Round once per array and unbox to Python floats in C
+                daily_total = np.round(totals, 2).tolist()
+                daily_pnl = np.round(pnls, 2).tolist()
+                # Day P&L is the change in total P&L from the previous day
+                day_pnl = np.round(day_pnls, 2).tolist()
+                timestamps = pd.date_range(start_date, periods=days, freq='D').strftime('%Y-%m-%dT%H:%M:%S').tolist()
+
+                performance_data = [
+                    {
+                        "timestamp": timestamp,
+                        "total_value": total_value,
+                        "day_pnl": pnl_change,
+                        "total_pnl": total_pnl
+                    }
+                    for timestamp, total_value, pnl_change, total_pnl in zip(timestamps, daily_total, day_pnl, daily_pnl)
+                ]
 
-                for i in range(days):
-                    current_date = start_date + timedelta(days=i)
-                    
-                    # Generate smoother price movements using a sine wave plus small random component
-                    # This creates more realistic looking data than pure random
-                    wave = np.sin(i / 10) * 0.005  # 0.5% sine wave
-                    random_component = np.random.normal(0, 0.002)  # 0.2% random component
-                    daily_change = 1 + wave + random_component
-                    
-                    daily_total = base_total_value * daily_change
-                    daily_pnl = base_total_pnl * daily_change
-                    
-                    performance_data.append({
-                        "timestamp": current_date.isoformat(),
-                        "total_value": round(daily_total, 2),
-                        "day_pnl": round(daily_pnl - (0 if i == 0 else performance_data[-1]["day_pnl"]), 2),
-                        "total_pnl": round(daily_pnl, 2)
-                    })
+                if len(_PERF_CACHE) >= _PERF_CACHE_MAX:
+                    _PERF_CACHE.clear()
+                _PERF_CACHE[cache_key] = (now, performance_data)
             
             return performance_data
         
         except Exception as e:
-            logger.error(f"Error getting historical performance: {str(e)}")
+            logger.error("Error getting historical performance: %s", e)
             # Return empty list instead of raising an error to handle gracefully in the frontend
             return []
 
@@ -108,10 +234,8 @@ class PortfolioService:
     def parse_order_data(self, order_data: Dict[str, Any]) -> Dict[str, Any]:
         """Map Flattrade order fields to internal schema"""
         # Parse timestamp like "08:38:15 30-08-2025"
-        raw_ts = order_data.get("norentm", "")
-        try:
-            parsed_ts = datetime.strptime(raw_ts, "%H:%M:%S %d-%m-%Y")
-        except ValueError:
+        parsed_ts = _parse_noren_ts(order_data.get("norentm") or "")
+        if parsed_ts is None:
             # If parsing fails, use current datetime as fallback
             parsed_ts = datetime.now()
             
@@ -119,7 +243,7 @@ class PortfolioService:
             "order_id": str(order_data.get("norenordno", "")),
             "symbol": order_data.get("tsym", ""),
             "quantity": int(order_data.get("qty", 0)),
-            "side": "BUY" if order_data.get("trantype") == "B" else "SELL",
+            "side": _SIDE_MAP.get(order_data.get("trantype"), "SELL"),
             "order_type": order_data.get("prctyp", ""),
             "price": float(order_data.get("prc", 0)),
             "trigger_price": float(order_data.get("trgprc", 0)) if order_data.get("trgprc") else None,
@@ -156,60 +280,51 @@ class PortfolioService:
                 order_data["trgprc"] = str(order_request.trigger_price)
 
             # Format payload as required by Flattrade
-            payload = f'jData={json.dumps(order_data)}&jKey={token}'
+            payload = b'jData=' + orjson.dumps(order_data) + b'&jKey=' + token.encode()
             
-            logger.info(f"Placing order with data: {order_data}")
+            logger.info("Placing order with data: %s", order_data)
             
             # Use correct API URL with proper scheme
             url = 'https://piconnect.flattrade.in/PiConnectTP/PlaceOrder'
-            headers = {
-                'Content-Type': 'application/x-www-form-urlencoded',
-                'Accept': 'application/json',
-                'User-Agent': 'Mozilla/5.0'  # Add user agent to prevent blocking
-            }
 
-            # Configure client with retries and longer timeout
+            # Shared client carries retries, timeouts and the common headers
             try:
-                transport = httpx.AsyncHTTPTransport(retries=3)
-                async with httpx.AsyncClient(
-                    timeout=30.0,
-                    transport=transport,
-                    verify=True,
-                    follow_redirects=True
-                ) as client:
-                    logger.info(f"Sending request to: {url}")
-                    response = await client.post(
-                        url,
-                        content=payload,
-                        headers=headers
+                client = await _get_client()
+                logger.info("Sending request to: %s", url)
+                response = await client.post(
+                    url,
+                    content=payload,
+                    headers=_FORM_HEADERS
+                )
+                
+                logger.info("Order API Response: %s - %s", response.status_code, response.text)
+                logger.debug("Order API Response size: %s bytes on the wire, %s decoded",
+                             response.num_bytes_downloaded, len(response.content))
+                
+                if response.status_code != 200:
+                    error_msg = f"Order placement failed: {response.text}"
+                    logger.error(error_msg)
+                    raise HTTPException(
+                        status_code=response.status_code,
+                        detail=error_msg
                     )
-                    
-                    logger.info(f"Order API Response: {response.status_code} - {response.text}")
-                    
-                    if response.status_code != 200:
-                        error_msg = f"Order placement failed: {response.text}"
-                        logger.error(error_msg)
-                        raise HTTPException(
-                            status_code=response.status_code,
-                            detail=error_msg
-                        )
-
-                    result = response.json()
-                    if result.get("stat") != "Ok":
-                        error_msg = result.get("emsg", "Order placement failed")
-                        logger.error(f"Order placement error: {error_msg}")
-                        raise HTTPException(
-                            status_code=400,
-                            detail=error_msg
-                        )
-
-                    logger.info(f"Order placed successfully: {result}")
-                    return {
-                        "status": "success",
-                        "order_id": result.get("norenordno"),
-                        "message": "Order placed successfully"
-                    }
-                    
+
+                result = orjson.loads(response.content)
+                if result.get("stat") != "Ok":
+                    error_msg = result.get("emsg", "Order placement failed")
+                    logger.error("Order placement error: %s", error_msg)
+                    raise HTTPException(
+                        status_code=400,
+                        detail=error_msg
+                    )
+
+                logger.info("Order placed successfully: %s", result)
+                return {
+                    "status": "success",
+                    "order_id": result.get("norenordno"),
+                    "message": "Order placed successfully"
+                }
+                
             except httpx.ConnectError as e:
                 error_msg = f"Failed to connect to Flattrade API: {str(e)}"
                 logger.error(error_msg)
@@ -229,51 +344,9 @@ class PortfolioService:
                 error_msg = f"Failed to place order: {str(e)}"
                 logger.error(error_msg)
                 raise HTTPException(status_code=500, detail=error_msg)
-                
-            logger.info(f"Order API Response: {response.status_code} - {response.text}")
-            
-            if response.status_code != 200:
-                error_msg = f"Order placement failed: {response.text}"
-                logger.error(error_msg)
-                raise HTTPException(
-                    status_code=response.status_code,
-                    detail=error_msg
-                )
-
-            result = response.json()
-            if result.get("stat") != "Ok":
-                error_msg = result.get("emsg", "Order placement failed")
-                logger.error(f"Order placement error: {error_msg}")
-                raise HTTPException(
-                    status_code=400,
-                    detail=error_msg
-                )
-
-            logger.info(f"Order placed successfully: {result}")
-            return {
-                "status": "success",
-                "order_id": result.get("norenordno"),
-                "message": "Order placed successfully"
-            }
-
-            # Call Flattrade API to place order
-            response = await flattrade_client.place_order(token, order_data)
-            
-            if not response.get("status", "").lower() == "success":
-                raise HTTPException(
-                    status_code=400,
-                    detail=response.get("message", "Failed to place order")
-                )
-
-            return {
-                "order_id": response.get("data", {}).get("order_id", ""),
-                "status": "success",
-                "message": "Order placed successfully",
-                "data": response.get("data", {})
-            }
 
         except Exception as e:
-            logger.error(f"Failed to place order: {str(e)}")
+            logger.error("Failed to place order: %s", e)
             raise HTTPException(
                 status_code=500,
                 detail=f"Failed to place order: {str(e)}"
@@ -293,217 +366,108 @@ class PortfolioService:
                     if not isinstance(orders_data, list):
                         orders_data = []
                 else:
-                    logger.warning(f"Unexpected response format from order history: {response}")
+                    logger.warning("Unexpected response format from order history: %s", response)
                     return []
             elif isinstance(response, list):
                 orders_data = response
             else:
-                logger.warning(f"Unexpected response type from order history: {type(response)}")
+                logger.warning("Unexpected response type from order history: %s", type(response))
                 return []
 
-            # Parse and format orders
+            # Drop non-dict entries and orders without an order ID up front
+            total = len(orders_data)
+            orders_data = [o for o in orders_data if isinstance(o, dict) and o.get("norenordno")]
+            if len(orders_data) != total:
+                logger.warning("Skipping %s invalid order entries", total - len(orders_data))
+
+            # Parse and validate each order; a malformed order is skipped on its own
             orders = []
+            validate = OrderHistoryItem.model_validate
+            parse = self.parse_order_data
             for order_data in orders_data:
-                if not isinstance(order_data, dict) or not order_data:
-                    logger.warning(f"Skipping invalid order data type: {type(order_data)}")
-                    continue
-                    
                 try:
-                    # Skip if essential fields are missing
-                    if not order_data.get("norenordno"):
-                        logger.warning(f"Skipping order data due to missing order ID: {order_data}")
-                        continue
-                        
-                    parsed_order = portfolio_service.parse_order_data(order_data)  # Using self to access instance method
-                    if not parsed_order:
-                        logger.warning("Parsed order data is empty, skipping")
-                        continue
-                        
-                    # Create OrderHistoryItem object
-                    order_item = OrderHistoryItem(**parsed_order)
-                    orders.append(order_item)
+                    orders.append(validate(parse(order_data)))
                 except Exception as e:
-                    logger.error(f"Failed to parse order data: {str(e)}, data: {order_data}")
+                    logger.error("Failed to parse order data: %s, data: %s", e, order_data)
                     continue
 
             return orders
 
         except Exception as e:
-            logger.error(f"Failed to get order history from Flattrade API-portfoloio: {str(e)}")
+            logger.error("Failed to get order history from Flattrade API-portfoloio: %s", e)
             raise HTTPException(
                 status_code=500,
                 detail=f"Failed to get order history from Flattrade API-portfoloio: {str(e)}"
             )
     
+    @staticmethod
+    def _parse_new_format(item: Dict[str, Any]) -> Position:
+        """Parse a standardized holding (direct symbol/quantity/price fields)"""
+        # Remove -EQ suffix if present
+        symbol = item['symbol']
+        if "-EQ" in symbol:
+            symbol = symbol.split("-")[0]
+
+        return Position(
+            symbol=symbol,
+            quantity=int(float(item['quantity'])),
+            side=item.get('side', 'LONG'),
+            entry_price=float(item['entry_price']),
+            current_price=float(item['current_price']),
+            pnl=float(item['pnl'])
+        )
+
+    @staticmethod
+    def _parse_old_format(item: Dict[str, Any]) -> Position:
+        """Parse a raw Flattrade holding keyed by exch_tsym"""
+        nse_symbol = next((sym for sym in item['exch_tsym'] if sym.get('exch') == 'NSE'), None)
+        if not nse_symbol:
+            raise ValueError("No NSE symbol found in old format")
+
+        symbol = nse_symbol['tsym'].replace('-EQ', '')
+        quantity = int(float(item.get('npoadqty', 0)))
+        entry_price = float(item.get('upldprc', 0))
+        current_price = float(item.get('upldprc', 0))
+        pnl = (current_price - entry_price) * quantity if quantity > 0 else 0.0
+
+        return Position(
+            symbol=symbol,
+            quantity=quantity,
+            side="LONG",
+            entry_price=entry_price,
+            current_price=current_price,
+            pnl=pnl
+        )
+
+    @staticmethod
+    def _parse_positions(items: List[Dict[str, Any]]) -> List[Position]:
+        """Parse a list of holdings, validating standardized data in a single pass"""
+        try:
+            positions = _POSITION_LIST_ADAPTER.validate_python(items)
+        except ValidationError as e:
+            logger.debug("Falling back to per-item position parsing: %s", e)
+        else:
+            # Symbols still carrying the -EQ suffix need the per-item cleanup
+            if not any("-EQ" in pos.symbol for pos in positions):
+                return positions
+        return [PortfolioService._parse_position_data(item) for item in items]
+
     @staticmethod
     def _parse_position_data(item: Dict[str, Any]) -> Position:
         """Parse raw position data from API to Position model"""
         if not isinstance(item, dict):
             raise ValueError("Invalid position data format")
-            
+
         try:
-            # First try to parse new format (direct fields)
-            if all(key in item for key in ['symbol', 'quantity', 'entry_price', 'current_price', 'pnl']):
-                # Remove -EQ suffix if present
-                symbol = item['symbol']
-                if "-EQ" in symbol:
-                    symbol = symbol.split("-")[0]
-                
-                return Position(
-                    symbol=symbol,
-                    quantity=int(float(item['quantity'])),
-                    side=item.get('side', 'LONG'),
-                    entry_price=float(item['entry_price']),
-                    current_price=float(item['current_price']),
-                    pnl=float(item['pnl'])
-                )
-                
-            # If that fails, try old format with exch_tsym
+            if all(key in item for key in _NEW_FORMAT_KEYS):
+                return PortfolioService._parse_new_format(item)
             if 'exch_tsym' in item:
-                nse_symbol = next((sym for sym in item['exch_tsym'] 
-                                if sym.get('exch') == 'NSE'), None)
-                
-                if not nse_symbol:
-                    raise ValueError("No NSE symbol found in old format")
-                    
-                symbol = nse_symbol['tsym'].replace('-EQ', '')
-                quantity = int(float(item.get('npoadqty', 0)))
-                entry_price = float(item.get('upldprc', 0))
-                current_price = float(item.get('upldprc', 0))
-                pnl = (current_price - entry_price) * quantity if quantity > 0 else 0.0
-                
-                return Position(
-                    symbol=symbol,
-                    quantity=quantity,
-                    side="LONG",
-                    entry_price=entry_price,
-                    current_price=current_price,
-                    pnl=pnl
-                )
-                
+                return PortfolioService._parse_old_format(item)
             raise ValueError("Data doesn't match any known format")
-            
         except (ValueError, TypeError, AttributeError) as e:
-            logger.error(f"Error parsing position data: {str(e)}, data: {item}")
+            logger.error("Error parsing position data: %s, data: %s", e, item)
             raise
-        
-        try:
-            # Extract and clean symbol (remove -EQ suffix if present)
-            symbol = item.get("tsym", "") or item.get("tradingsymbol", "") or item.get("symbol", "")
-            if "-EQ" in symbol:
-                symbol = symbol.split("-")[0]
-            
-            # Extract quantity with proper type conversion
-            qty_str = item.get("holdqty", "") or item.get("netqty", "") or item.get("quantity", "0")
-            quantity = abs(int(float(qty_str)))
-            
-            # Extract prices
-            entry_price = float(item.get("purchasePrice", "") or item.get("avgprc", "") or item.get("entry_price", "0"))
-            current_price = float(item.get("ltp", "") or item.get("cprc", "") or item.get("current_price", "0"))
-            
-            # Calculate or get P&L
-            pnl = float(item.get("dayPL", "") or item.get("rpnl", "") or item.get("pnl", "0"))
-            
-            return Position(
-                symbol=symbol,
-                quantity=quantity,
-                side="LONG",  # Holdings are always long positions
-                entry_price=entry_price,
-                current_price=current_price,
-                pnl=pnl
-            )
-            
-        except (ValueError, TypeError) as e:
-            logger.error(f"Error parsing position data: {str(e)} for item: {item}")
-            return Position(
-                symbol=str(item.get("tsym", "UNKNOWN")),
-                quantity=0,
-                side="LONG",
-                entry_price=0.0,
-                current_price=0.0,
-                pnl=0.0
-            )
-            
-        try:
-            # Extract values with proper type conversion and defaults
-            symbol = str(item.get("symbol", ""))
-            quantity = abs(int(float(item.get("quantity", 0))))
-            entry_price = float(item.get("entry_price", 0))
-            current_price = float(item.get("current_price", 0))
-            pnl = float(item.get("pnl", 0))
-            side = str(item.get("side", "LONG"))
-            
-            return Position(
-                symbol=symbol,
-                quantity=quantity,
-                side=side,
-                entry_price=entry_price,
-                current_price=current_price,
-                pnl=pnl
-            )
-        except (ValueError, TypeError) as e:
-            logger.error(f"Error parsing position data: {str(e)}")
-            # Return a default position if parsing fails
-            return Position(
-                symbol="UNKNOWN",
-                quantity=0,
-                side="LONG",
-                entry_price=0.0,
-                current_price=0.0,
-                pnl=0.0
-            )
-        
-        if not isinstance(item, dict):
-            logger.warning(f"Invalid position data type: {type(item)}")
-            raise ValueError("Position data must be a dictionary")
-            
-        # Get symbol with fallback to empty string if none found
-        symbol = str(item.get("symbol", "") or item.get("tradingsymbol", "") or item.get("scrip_code", ""))
-        if not symbol:
-            raise ValueError("Position data must contain a symbol")
-            
-        try:
-            # Parse quantity with proper type handling and convert to int
-            quantity = int(float(item.get("quantity", 0) or item.get("netqty", 0) or 
-                        (float(item.get("buy_qty", 0)) - float(item.get("sell_qty", 0)))))
-            side = "LONG" if quantity > 0 else "SHORT" if quantity < 0 else "FLAT"
-            
-            # Parse prices with proper type handling
-            entry_price = float(
-                item.get("entry_price", 0.0) or 
-                item.get("average_price", 0.0) or 
-                item.get("buy_price", 0.0) or
-                0.0
-            )
-            
-            current_price = float(
-                item.get("current_price", entry_price) or 
-                item.get("last_price", entry_price) or 
-                item.get("ltp", entry_price) or
-                entry_price
-            )
-            
-            # Calculate PNL with proper type handling
-            try:
-                pnl = float(item.get("pnl", 0.0))
-            except (TypeError, ValueError):
-                pnl = 0.0
-                
-            if pnl == 0.0 and quantity != 0:
-                pnl = (current_price - entry_price) * abs(quantity)
-        except (TypeError, ValueError) as e:
-            logger.error(f"Error parsing position data values: {str(e)}")
-            raise ValueError(f"Invalid position data values: {str(e)}")
-        
-        return Position(
-            symbol=symbol,
-            quantity=abs(quantity),
-            side=side,
-            entry_price=float(entry_price),
-            current_price=float(current_price),
-            pnl=float(pnl or 0.0)
-        )
-    
+
     @staticmethod
     def calculate_portfolio_stats(positions: List[Position]) -> PortfolioStats:
         """Calculate portfolio statistics"""
@@ -519,16 +483,50 @@ class PortfolioService:
                 worst_performer=None
             )
 
-        total_pnl = sum(pos.pnl for pos in positions)
-        total_investment = sum(pos.entry_price * pos.quantity for pos in positions)
-        current_value = sum(pos.current_price * pos.quantity for pos in positions)
-        total_quantity = sum(pos.quantity for pos in positions)
+        if len(positions) >= _SOA_MIN_POSITIONS:
+            # Large portfolios: struct-of-arrays so every aggregate is one C-level reduction
+            n = len(positions)
+            pnl = np.fromiter((pos.pnl for pos in positions), dtype=np.float64, count=n)
+            entry_price = np.fromiter((pos.entry_price for pos in positions), dtype=np.float64, count=n)
+            current_price = np.fromiter((pos.current_price for pos in positions), dtype=np.float64, count=n)
+            quantity = np.fromiter((pos.quantity for pos in positions), dtype=np.int64, count=n)
+
+            total_pnl = float(pnl.sum())
+            total_investment = float((entry_price * quantity).sum())
+            current_value = float((current_price * quantity).sum())
+            total_quantity = int(quantity.sum())
+            winning_positions = int(np.count_nonzero(pnl > 0))
+            losing_positions = int(np.count_nonzero(pnl < 0))
+            best_performer = positions[int(pnl.argmax())]
+            worst_performer = positions[int(pnl.argmin())]
+        else:
+            # Single pass over positions for all aggregates
+            total_pnl = 0.0
+            total_investment = 0.0
+            current_value = 0.0
+            total_quantity = 0
+            winning_positions = 0
+            losing_positions = 0
+            best_performer = worst_performer = positions[0]
+            best_pnl = worst_pnl = best_performer.pnl
 
-        winning_positions = len([pos for pos in positions if pos.pnl > 0])
-        losing_positions = len([pos for pos in positions if pos.pnl < 0])
-
-        best_performer = max(positions, key=lambda x: x.pnl) if positions else None
-        worst_performer = min(positions, key=lambda x: x.pnl) if positions else None
+            for pos in positions:
+                pnl = pos.pnl
+                quantity = pos.quantity
+                total_pnl += pnl
+                total_investment += pos.entry_price * quantity
+                current_value += pos.current_price * quantity
+                total_quantity += quantity
+
+                if pnl > 0:
+                    winning_positions += 1
+                elif pnl < 0:
+                    losing_positions += 1
+
+                if pnl > best_pnl:
+                    best_performer, best_pnl = pos, pnl
+                if pnl < worst_pnl:
+                    worst_performer, worst_pnl = pos, pnl
 
         return PortfolioStats(
             total_pnl=total_pnl,
@@ -551,7 +549,7 @@ class PortfolioService:
             
             # In a real implementation, you'd make batch API calls to get current prices
             # For now, we'll simulate this or make individual calls if needed
-            logger.info(f"Refreshing market data for {len(symbols)} symbols")
+            logger.info("Refreshing market data for %s symbols", len(symbols))
             
             # This would be replaced with actual market data API calls
             updated_positions = []
@@ -563,7 +561,7 @@ class PortfolioService:
             return updated_positions
             
         except Exception as e:
-            logger.error(f"Failed to refresh market data: {str(e)}")
+            logger.error("Failed to refresh market data: %s", e)
             return positions
     
     @staticmethod
@@ -599,56 +597,36 @@ class PortfolioService:
                 if response_data.get("success") is True:  # Compare with boolean True instead of string "True"
                     holdings_data = response_data.get("data", [])
                     if isinstance(holdings_data, list):
-                        return [self._parse_position_data(pos) for pos in holdings_data if isinstance(pos, dict)]
+                        return self._parse_positions([pos for pos in holdings_data if isinstance(pos, dict)])
                 else:
                     error_msg = response_data.get("emsg", "Unknown error from Flattrade API")
-                    logger.error(f"Flattrade API error: {error_msg} with response: {response_data}")
+                    logger.error("Flattrade API error: %s with response: %s", error_msg, response_data)
                     if response_data.get("success") is True and isinstance(response_data.get("data"), list):
                         # If we have valid data despite error message, return it
-                        return [self._parse_position_data(pos) for pos in response_data["data"] if isinstance(pos, dict)]
+                        return self._parse_positions([pos for pos in response_data["data"] if isinstance(pos, dict)])
                     raise HTTPException(status_code=400, detail=error_msg)
                     
                             
-            logger.error(f"Unexpected response format from Flattrade API: {response_data}")
+            logger.error("Unexpected response format from Flattrade API: %s", response_data)
             raise HTTPException(status_code=500, detail="Invalid response format from Flattrade API")
             
         except HTTPException:
             raise
         except Exception as e:
-            logger.error(f"Failed to get holdings: {str(e)}")
+            logger.error("Failed to get holdings: %s", e)
             raise HTTPException(status_code=500, detail=str(e))
 
     async def get_portfolio(self, token: str) -> Dict[str, Any]:
         """Get user's portfolio with positions and statistics"""
         try:
             # Fetch holdings from Flattrade API
-            response_data = await flattrade_client.get_holdings(token)
-            #logger.debug('Raw holdings response:', response_data)
+            try:
+                holdings = await self.get_holdings(token)
+            except HTTPException as e:
+                logger.warning("Unexpected holdings response: %s", e.detail)
+                holdings = []
 
-            portfolio = []
-            
-            # Process the holdings data
-            if isinstance(response_data, dict) and response_data.get("success"):
-                holdings_data = response_data.get("data", [])
-                if holdings_data:
-                    for holding in holdings_data:
-                        try:
-                            # Create Position objects from the standardized format
-                            position = Position(
-                                symbol=holding["symbol"],
-                                quantity=holding["quantity"],
-                                side=holding["side"],
-                                entry_price=holding["entry_price"],
-                                current_price=holding["current_price"],
-                                pnl=holding["pnl"]
-                            )
-                            if position.symbol and position.quantity > 0:
-                                portfolio.append(position)
-                        except Exception as e:
-                            logger.warning(f"Failed to create position from holding data: {str(e)}")
-                            continue
-            else:
-                logger.warning(f"Unexpected holdings response format: {response_data}")
+            portfolio = [pos for pos in holdings if pos.symbol and pos.quantity > 0]
             
             # Calculate portfolio statistics
             stats = self.calculate_portfolio_stats(portfolio)
@@ -656,31 +634,22 @@ class PortfolioService:
             # Prepare the response
             portfolio_data = {
                 "success": True,
-                "portfolio": [
-                    {
-                        "symbol": pos.symbol,
-                        "quantity": pos.quantity,
-                        "side": pos.side,
-                        "entry_price": pos.entry_price,
-                        "current_price": pos.current_price,
-                        "pnl": pos.pnl
-                    } for pos in portfolio
-                ],
+                "portfolio": [pos.model_dump() for pos in portfolio],
                 "total_pnl": stats.total_pnl,
                 "total_investment": stats.total_investment,
                 "current_value": stats.current_value,
                 "total_quantity": stats.total_quantity,
                 "winning_positions": stats.winning_positions,
                 "losing_positions": stats.losing_positions,
-                "best_performer": stats.best_performer.dict() if stats.best_performer else None,
-                "worst_performer": stats.worst_performer.dict() if stats.worst_performer else None
+                "best_performer": stats.best_performer.model_dump() if stats.best_performer else None,
+                "worst_performer": stats.worst_performer.model_dump() if stats.worst_performer else None
             }
 
-            logger.info(f"Returning portfolio with {len(portfolio)} positions")
+            logger.info("Returning portfolio with %s positions", len(portfolio))
             return portfolio_data
             
         except Exception as e:
-            logger.error(f"Failed to get portfolio: {str(e)}")
+            logger.error("Failed to get portfolio: %s", e)
             # Use fallback data for development/testing
             portfolio = self._create_fallback_portfolio()
             stats = self.calculate_portfolio_stats(portfolio)
@@ -694,8 +663,8 @@ class PortfolioService:
                 "total_quantity": stats.total_quantity,
                 "winning_positions": stats.winning_positions,
                 "losing_positions": stats.losing_positions,
-                "best_performer": stats.best_performer.dict() if stats.best_performer else None,
-                "worst_performer": stats.worst_performer.dict() if stats.worst_performer else None
+                "best_performer": stats.best_performer.model_dump() if stats.best_performer else None,
+                "worst_performer": stats.worst_performer.model_dump() if stats.worst_performer else None
             }
 
 # Global service instance
@@ -1,10 +1,12 @@
 # services/websocket_service.py - Fixed version
 import asyncio
-import json
 import logging
+import math
 import random
+import time
 from dataclasses import dataclass, field
-from typing import Dict, Optional, Set, Any
+from typing import Dict, Optional, Set, Any, Tuple
+import orjson
 import websockets
 from fastapi import WebSocket
 from services.flattrade_client import flattrade_client
@@ -12,16 +14,43 @@ from services.flattrade_client import flattrade_client
 logger = logging.getLogger("services.websocket_service")
 logger.setLevel(logging.INFO)
 
-@dataclass(frozen=True)  # Make it hashable by making it frozen (immutable)
+# Per-client send queue bound; ticks for a client that falls this far behind are dropped
+CLIENT_QUEUE_MAX = 1024
+# Most ticks a client writer coalesces into one batch frame
+WRITER_BATCH_MAX = 64
+# Subscription changes within this window (seconds) go to FlatTrade as one request
+SUB_FLUSH_DELAY = 0.01
+# Refresh interval (seconds) of the cached tick timestamp
+CLOCK_INTERVAL = 0.2
+
+def _tick_template(symbol: str, token: str, exchange: str) -> bytes:
+    """Pre-encode a token's outgoing tick JSON with %-placeholders for the per-tick fields"""
+    def lit(value: str) -> bytes:
+        # JSON-escape the static string, then escape it for %-formatting
+        return orjson.dumps(value).replace(b"%", b"%%")
+
+    return (
+        b'{"symbol":' + lit(symbol) + b',"token":' + lit(token) + b',"exchange":' + lit(exchange)
+        # %r on a float is its shortest round-trip repr, the same text a JSON encoder emits
+        + b',"timestamp":%d,"data":{"open":%r,"high":%r,"low":%r,"close":%r,"last_price":%r,'
+        b'"volume":%d,"time":%d},"feed_type":"%b"}'
+    )
+
+def _price(raw: Any, default: float) -> float:
+    """Parse a FlatTrade price field, using default when it is missing, empty or not finite"""
+    if not raw:
+        return default
+    value = float(raw)
+    # %r renders nan/inf as bare words, which would break JSON.parse for the whole batch frame
+    return value if math.isfinite(value) else default
+
+@dataclass(frozen=True, slots=True)  # frozen generates __hash__; slots drops the per-instance dict
 class SymbolInfo:
     formatted_symbol: str  # NSE|TCS-EQ
     token: str            # Numeric token from FlatTrade
     tsym: str            # Trading symbol (TCS-EQ)
     exchange: str        # NSE
-    
-    def __hash__(self):
-        return hash((self.formatted_symbol, self.token, self.tsym, self.exchange))
-    
+
 @dataclass
 class FTSession:
     user_id: str
@@ -33,10 +62,19 @@ class FTSession:
     # subscription sets hold SymbolInfo objects (now hashable)
     detailed_symbols: Set[SymbolInfo] = field(default_factory=set)
     touchline_symbols: Set[SymbolInfo] = field(default_factory=set)
-    # clients: token -> set of FastAPI WebSocket objects
-    clients: Dict[str, Set[WebSocket]] = field(default_factory=dict)
+    # cached "NSE|token#NSE|token2" subscription strings per feed ("d"/"t"); None means rebuild
+    joined_tokens: Dict[str, Optional[str]] = field(default_factory=lambda: {"d": "", "t": ""})
+    # clients: token -> {FastAPI WebSocket: that client's send queue}
+    clients: Dict[str, Dict[WebSocket, asyncio.Queue]] = field(default_factory=dict)
+    # one send queue and writer task per client, shared across the tokens it subscribes to
+    queues: Dict[WebSocket, asyncio.Queue] = field(default_factory=dict)
+    writers: Dict[WebSocket, asyncio.Task] = field(default_factory=dict)
     # mapping FT token to SymbolInfo
     token_to_symbol: Dict[str, SymbolInfo] = field(default_factory=dict)
+    # reverse index: (exchange, tsym) -> FT token
+    symbol_to_token: Dict[Tuple[str, str], str] = field(default_factory=dict)
+    # per-token pre-encoded tick template (see _tick_template), built once on subscribe
+    tick_templates: Dict[str, bytes] = field(default_factory=dict)
     # reconnect state
     reconnect_backoff: float = 1.0
     reconnecting: bool = False
@@ -50,8 +88,17 @@ class WebSocketService:
         self.connect_kwargs = dict(
             ping_interval=20,
             ping_timeout=10,
-            max_size=2**22
+            max_size=2**22,
+            # No permessage-deflate upstream: FT ticks are small and arrive at a high rate,
+            # so per-message compression would cost more CPU than it saves in bytes
+            compression=None
         )
+        # (session_token, feed_type) -> scheduled subscription flush
+        self._pending_sub_flush: Dict[Tuple[str, str], asyncio.TimerHandle] = {}
+        self._sub_flush_tasks: Set[asyncio.Task] = set()
+        # Tick timestamp, refreshed on the event loop instead of a time() call per tick
+        self._now = int(time.time())
+        self._clock_handle: Optional[asyncio.TimerHandle] = None
 
     async def connect_to_flattrade(self, user_id: str, session_token: str) -> bool:
         """Ensure FTSession exists and is connected"""
@@ -72,6 +119,7 @@ class WebSocketService:
                     ping_interval=self.connect_kwargs.get("ping_interval"),
                     ping_timeout=self.connect_kwargs.get("ping_timeout"),
                     max_size=self.connect_kwargs.get("max_size"),
+                    compression=self.connect_kwargs.get("compression"),
                 )
 
                 connect_payload = {
@@ -81,7 +129,7 @@ class WebSocketService:
                     "source": "API",
                     "susertoken": session_token
                 }
-                await session.ws.send(json.dumps(connect_payload))
+                await session.ws.send(orjson.dumps(connect_payload).decode())
                 logger.debug("Sent connection request to FlatTrade")
 
                 try:
@@ -92,7 +140,7 @@ class WebSocketService:
                     return False
 
                 try:
-                    ack = json.loads(raw)
+                    ack = orjson.loads(raw)
                 except Exception as e:
                     logger.error("Invalid ack from FlatTrade: %s, error: %s", raw, e)
                     await self._close_ft_ws(session)
@@ -145,25 +193,38 @@ class WebSocketService:
             
             logger.info("Resolved symbol %s to token %s", symbol, token)
             
-            # Add client to token-based mapping
-            if symbol_info.token not in session.clients:
-                session.clients[symbol_info.token] = set()
-            session.clients[symbol_info.token].add(client_ws)
+            # Add client to token-based mapping, starting its writer on first subscription
+            queue = session.queues.get(client_ws)
+            if queue is None:
+                queue = session.queues[client_ws] = asyncio.Queue(maxsize=CLIENT_QUEUE_MAX)
+                session.writers[client_ws] = asyncio.create_task(self._client_writer(session, client_ws, queue))
+            session.clients.setdefault(symbol_info.token, {})[client_ws] = queue
             
             # Store token mapping
             session.token_to_symbol[symbol_info.token] = symbol_info
+            session.symbol_to_token[(exchange, symbol)] = symbol_info.token
+            session.tick_templates[symbol_info.token] = _tick_template(
+                symbol.replace("-EQ", ""), symbol_info.token, exchange
+            )
             
             # Add to subscription set (now works because SymbolInfo is hashable)
             target_set = session.detailed_symbols if feed_type == "d" else session.touchline_symbols
             was_new_symbol = symbol_info not in target_set
             target_set.add(symbol_info)
+            if was_new_symbol:
+                # Extend the cached subscription string instead of rebuilding it
+                kind = "d" if feed_type == "d" else "t"
+                joined = session.joined_tokens[kind]
+                if joined is not None:
+                    new = f"{exchange}|{symbol_info.token}"
+                    session.joined_tokens[kind] = joined + "#" + new if joined else new
             
             logger.info("Client subscribed to %s (token=%s), clients count: %d", 
                        symbol, token, len(session.clients[symbol_info.token]))
             
             # Send subscription request only if this is a new symbol
             if was_new_symbol:
-                await self._send_subscription_request_for_session(session, feed_type)
+                self._schedule_sub_flush(session, feed_type)
                 
         except Exception as e:
             logger.exception("Failed to subscribe to %s: %s", symbol, e)
@@ -177,66 +238,89 @@ class WebSocketService:
             return
 
         # Find token for this symbol
-        token = None
-        symbol_info = None
-        for t, info in session.token_to_symbol.items():
-            if info.tsym == symbol and info.exchange == exchange:
-                token = t
-                symbol_info = info
-                break
+        token = session.symbol_to_token.get((exchange, symbol))
         
         if not token or token not in session.clients:
             return
 
         if client_ws in session.clients[token]:
-            session.clients[token].remove(client_ws)
+            del session.clients[token][client_ws]
+            if not any(client_ws in clients for clients in session.clients.values()):
+                self._release_client(session, client_ws)
             
             if len(session.clients[token]) == 0:
-                # Remove completely
-                del session.clients[token]
-                
-                # Remove from subscription sets (now works because SymbolInfo is hashable)
-                if symbol_info:
-                    session.detailed_symbols.discard(symbol_info)
-                    session.touchline_symbols.discard(symbol_info)
-                    del session.token_to_symbol[token]
-                
-                # Update subscriptions
-                await self._send_subscription_request_for_session(session, "d")
-                await self._send_subscription_request_for_session(session, "t")
-                
+                self._drop_token(session, token)
                 logger.info("Unsubscribed %s (token=%s)", symbol, token)
             else:
                 logger.info("Client removed from %s, %d remaining", symbol, len(session.clients[token]))
 
+    def _drop_token(self, session: FTSession, token: str) -> None:
+        """Forget a token with no clients left and schedule the FT subscription update"""
+        # Remove completely
+        session.clients.pop(token, None)
+        session.tick_templates.pop(token, None)
+
+        # Remove from subscription sets (now works because SymbolInfo is hashable)
+        symbol_info = session.token_to_symbol.pop(token, None)
+        if symbol_info:
+            session.detailed_symbols.discard(symbol_info)
+            session.touchline_symbols.discard(symbol_info)
+            # Removal from the middle is rare; rebuild the cached strings on next send
+            session.joined_tokens["d"] = session.joined_tokens["t"] = None
+            session.symbol_to_token.pop((symbol_info.exchange, symbol_info.tsym), None)
+
+        # Update subscriptions
+        self._schedule_sub_flush(session, "d")
+        self._schedule_sub_flush(session, "t")
+
+    def _schedule_sub_flush(self, session: FTSession, subscription_type: str) -> None:
+        """Debounce subscription requests so a burst of changes sends one FT payload"""
+        key = (session.session_token, subscription_type)
+        if key not in self._pending_sub_flush:
+            self._pending_sub_flush[key] = asyncio.get_running_loop().call_later(
+                SUB_FLUSH_DELAY, self._run_sub_flush, session, subscription_type
+            )
+
+    def _run_sub_flush(self, session: FTSession, subscription_type: str) -> None:
+        self._pending_sub_flush.pop((session.session_token, subscription_type), None)
+        task = asyncio.create_task(self._send_subscription_request_for_session(session, subscription_type))
+        # Hold a reference until the send completes
+        self._sub_flush_tasks.add(task)
+        task.add_done_callback(self._sub_flush_tasks.discard)
+
     async def _send_subscription_request_for_session(self, session: FTSession, subscription_type: str) -> None:
         """Send subscription request using tokens"""
         if not session.connected or not session.ws:
             logger.debug("Session not connected, cannot send subscription request")
             return
 
-        symbols = session.detailed_symbols if subscription_type == "d" else session.touchline_symbols
+        kind = "d" if subscription_type == "d" else "t"
+        symbols = session.detailed_symbols if kind == "d" else session.touchline_symbols
         if not symbols:
             logger.debug("No symbols to subscribe for type %s", subscription_type)
             return
             
         # FlatTrade expects format: "NSE|token#NSE|token2"
-        formatted_tokens = []
-        for symbol_info in symbols:
-            formatted_tokens.append(f"{symbol_info.exchange}|{symbol_info.token}")
-            
-        if formatted_tokens:
-            payload = {"t": subscription_type, "k": "#".join(formatted_tokens)}
-            try:
-                await session.ws.send(json.dumps(payload))
-                logger.info("Sent %s subscription for %d symbols: %s", 
-                           subscription_type, len(formatted_tokens), formatted_tokens[:3])
-            except Exception as e:
-                logger.exception("Failed to send subscription: %s", e)
+        joined = session.joined_tokens[kind]
+        if joined is None:
+            joined = session.joined_tokens[kind] = "#".join(
+                f"{symbol_info.exchange}|{symbol_info.token}" for symbol_info in symbols
+            )
+
+        payload = {"t": subscription_type, "k": joined}
+        try:
+            # FlatTrade expects text frames
+            await session.ws.send(orjson.dumps(payload).decode())
+            logger.info("Sent %s subscription for %d symbols: %s", 
+                       subscription_type, len(symbols), joined[:64])
+        except Exception as e:
+            logger.exception("Failed to send subscription: %s", e)
 
     async def _listen_to_flattrade(self, session: FTSession) -> None:
-        """Listen for FlatTrade messages and forward to clients"""
+        """Listen for FlatTrade messages and queue them for client writers"""
         logger.info("Starting FT listener for session")
+        if self._clock_handle is None:
+            self._tick_clock()
         
         while not session.stop_reconnect:
             try:
@@ -249,42 +333,8 @@ class WebSocketService:
                     logger.warning("Received None from WebSocket")
                     break
 
-                try:
-                    data = json.loads(raw)
-                    logger.debug("FT message: %s", data)
-                except Exception:
-                    logger.debug("Non-JSON message from FT: %s", raw)
-                    continue
-
-                t = data.get("t")
-                if t in ("df", "tf", "d", "t"):
-                    # Get token from message
-                    incoming_token = str(data.get("tk", ""))
-                    
-                    if incoming_token in session.clients:
-                        symbol_info = session.token_to_symbol.get(incoming_token)
-                        if symbol_info:
-                            # Transform market data for chart
-                            transformed = self._transform_market_data(data, symbol_info)
-                            
-                            # Send to all clients for this token
-                            dead_clients = set()
-                            for client in list(session.clients[incoming_token]):
-                                try:
-                                    await client.send_text(json.dumps(transformed))
-                                except Exception as e:
-                                    logger.debug("Client send failed, will remove: %s", e)
-                                    dead_clients.add(client)
-                            
-                            # Clean up dead connections
-                            for dead in dead_clients:
-                                session.clients[incoming_token].discard(dead)
-                    else:
-                        logger.debug("No clients for token %s", incoming_token)
-                elif t == "ck":
-                    logger.debug("Received connect-ack: %s", data)
-                else:
-                    logger.debug("Other FT message type %s: %s", t, data)
+                # Only enqueues; client writers do the sending and batching
+                self._handle_ft_message(session, raw)
 
             except websockets.ConnectionClosed:
                 logger.warning("FlatTrade connection closed unexpectedly")
@@ -298,6 +348,72 @@ class WebSocketService:
         logger.info("FT listener ended for session")
         session.connected = False
 
+    def _handle_ft_message(self, session: FTSession, raw: Any) -> None:
+        """Parse one FlatTrade message and queue the transformed tick for each subscribed client"""
+        try:
+            data = orjson.loads(raw)
+            logger.debug("FT message: %s", data)
+        except Exception:
+            logger.debug("Non-JSON message from FT: %s", raw)
+            return
+
+        t = data.get("t")
+        if t in ("df", "tf", "d", "t"):
+            # Get token from message
+            incoming_token = str(data.get("tk", ""))
+            
+            subscribers = session.clients.get(incoming_token)
+            if subscribers:
+                template = session.tick_templates.get(incoming_token)
+                if template:
+                    # Transform market data for chart, encoding once for every subscriber.
+                    # Nothing here awaits, so the subscriber map cannot change mid-iteration.
+                    payload = self._transform_market_data(data, template)
+                    for queue in subscribers.values():
+                        try:
+                            queue.put_nowait(payload)
+                        except asyncio.QueueFull:
+                            # Slow client: drop the tick rather than stall the FT receive loop
+                            logger.debug("Client queue full for token %s, dropping tick", incoming_token)
+            else:
+                logger.debug("No clients for token %s", incoming_token)
+        elif t == "ck":
+            logger.debug("Received connect-ack: %s", data)
+        else:
+            logger.debug("Other FT message type %s: %s", t, data)
+
+    async def _client_writer(self, session: FTSession, client: WebSocket, queue: asyncio.Queue) -> None:
+        """Send queued encoded ticks to one client, coalescing whatever has piled up into one batch frame"""
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < WRITER_BATCH_MAX and not queue.empty():
+                batch.append(queue.get_nowait())
+            try:
+                # Ticks are queued pre-encoded; splice them into one binary batch frame
+                await client.send_bytes(b'{"type":"batch","items":[' + b','.join(batch) + b']}')
+            except Exception as e:
+                logger.debug("Client send failed, removing: %s", e)
+                self._remove_dead_client(session, client)
+                return
+
+    def _remove_dead_client(self, session: FTSession, client: WebSocket) -> None:
+        """Cold-path cleanup run by a writer whose client went away"""
+        session.queues.pop(client, None)
+        session.writers.pop(client, None)
+        emptied = []
+        for token, clients in session.clients.items():
+            if clients.pop(client, None) is not None and not clients:
+                emptied.append(token)
+        for token in emptied:
+            self._drop_token(session, token)
+
+    def _release_client(self, session: FTSession, client: WebSocket) -> None:
+        """Stop a client's writer once it has no subscriptions left"""
+        session.queues.pop(client, None)
+        writer = session.writers.pop(client, None)
+        if writer:
+            writer.cancel()
+
     async def _close_ft_ws(self, session: FTSession) -> None:
         """Close WebSocket connection"""
         try:
@@ -308,37 +424,25 @@ class WebSocketService:
         session.ws = None
         session.connected = False
 
-    def _transform_market_data(self, data: dict, symbol_info: SymbolInfo) -> dict:
-        """Transform FlatTrade data to chart format"""
-        import time
-        
-        # Extract price data
-        ltp = float(data.get("lp", 0) or data.get("c", 0) or 0)
-        open_price = float(data.get("o", ltp) or ltp)
-        high_price = float(data.get("h", ltp) or ltp)
-        low_price = float(data.get("l", ltp) or ltp)
-        volume = int(data.get("v", 0) or 0)
+    def _tick_clock(self) -> None:
+        self._now = int(time.time())
+        self._clock_handle = asyncio.get_running_loop().call_later(CLOCK_INTERVAL, self._tick_clock)
+
+    def _transform_market_data(self, data: dict, template: bytes) -> bytes:
+        """Transform FlatTrade data to the chart's JSON tick by filling the token's template"""
+        g = data.get
+        # Extract price data; missing or empty OHLC fields fall back to the last price
+        ltp = _price(g("lp") or g("c"), 0.0)
+        open_price = _price(g("o"), ltp)
+        high_price = _price(g("h"), ltp)
+        low_price = _price(g("l"), ltp)
+        volume = int(g("v") or 0)
         
-        # Generate timestamp
-        timestamp = int(time.time())
+        # Cached timestamp, at most CLOCK_INTERVAL stale
+        timestamp = self._now
+        feed_type = b"detailed" if g("t", "").startswith("d") else b"touchline"
         
-        return {
-            "symbol": symbol_info.tsym.replace("-EQ", ""),
-            "token": symbol_info.token,
-            "exchange": symbol_info.exchange,
-            "timestamp": timestamp,
-            "data": {
-                "open": open_price,
-                "high": high_price,
-                "low": low_price,
-                "close": ltp,
-                "last_price": ltp,
-                "volume": volume,
-                "time": timestamp
-            },
-            "feed_type": "detailed" if data.get("t", "").startswith("d") else "touchline",
-            "raw": data
-        }
+        return template % (timestamp, open_price, high_price, low_price, ltp, ltp, volume, timestamp, feed_type)
 
 # Global instance
 websocket_service = WebSocketService()
\ No newline at end of file
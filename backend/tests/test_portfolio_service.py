@@ -0,0 +1,30 @@
+import asyncio
+from datetime import datetime
+from unittest import mock
+
+from services import portfolio_service
+from services.portfolio_service import _parse_noren_ts
+
+
+def test_parse_noren_ts_uses_sliced_path():
+    _parse_noren_ts.cache_clear()
+    with mock.patch.object(portfolio_service, "datetime", wraps=datetime) as dt:
+        assert _parse_noren_ts("08:38:15 30-08-2025") == datetime(2025, 8, 30, 8, 38, 15)
+        dt.strptime.assert_not_called()
+
+
+def test_parse_noren_ts_falls_back_and_rejects_malformed():
+    _parse_noren_ts.cache_clear()
+    assert _parse_noren_ts("8:38:15 30-08-2025") == datetime(2025, 8, 30, 8, 38, 15)
+    assert _parse_noren_ts("08:38:15 31-02-2025") is None
+    assert _parse_noren_ts("") is None
+
+
+def test_get_order_history_skips_only_the_invalid_order():
+    good = {"norenordno": "1", "tsym": "INFY-EQ", "qty": "5", "trantype": "B", "prctyp": "LMT",
+            "prc": "1500", "prd": "C", "status": "COMPLETE", "norentm": "08:38:15 30-08-2025"}
+    bad = dict(good, norenordno="2", tsym=None)
+    fetch = mock.AsyncMock(return_value=[good, bad, dict(good, norenordno="3")])
+    with mock.patch.object(portfolio_service.flattrade_client, "get_order_history", fetch):
+        orders = asyncio.run(portfolio_service.PortfolioService().get_order_history("token"))
+    assert [o.order_id for o in orders] == ["1", "3"]
@@ -0,0 +1,29 @@
+import orjson
+
+from services.websocket_service import WebSocketService, _tick_template
+
+
+def _tick(data):
+    service = WebSocketService()
+    service._now = 1756543095
+    return orjson.loads(service._transform_market_data(data, _tick_template('A%d"B-EQ', "2885", "NSE")))
+
+
+def test_transform_market_data_is_valid_json():
+    tick = _tick({"t": "df", "lp": "101.5", "o": "100", "h": "102.25", "l": "99.75", "v": "1200"})
+    assert tick == {
+        "symbol": 'A%d"B-EQ',
+        "token": "2885",
+        "exchange": "NSE",
+        "timestamp": 1756543095,
+        "data": {"open": 100.0, "high": 102.25, "low": 99.75, "close": 101.5,
+                 "last_price": 101.5, "volume": 1200, "time": 1756543095},
+        "feed_type": "detailed",
+    }
+
+
+def test_transform_market_data_replaces_non_finite_prices():
+    tick = _tick({"t": "tf", "lp": "nan", "c": "99", "o": "inf", "h": "-inf", "l": "98"})
+    assert tick["data"] == {"open": 0.0, "high": 0.0, "low": 98.0, "close": 0.0,
+                            "last_price": 0.0, "volume": 0, "time": 1756543095}
+    assert tick["feed_type"] == "touchline"
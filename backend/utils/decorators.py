@@ -1,17 +1,24 @@
+import asyncio
 import functools
+import random
 import time
-from typing import Callable
+from typing import Callable, Tuple, Type
 from core.logging import get_logger
 
 logger = get_logger(__name__)
 
-def retry(max_attempts: int = 3, delay: float = 1.0):
+def retry(
+    max_attempts: int = 3,
+    delay: float = 1.0,
+    exceptions: Tuple[Type[BaseException], ...] = (TimeoutError, ConnectionError)
+):
     """
     Retry decorator for functions that may fail temporarily
     
     Args:
         max_attempts: Maximum number of retry attempts
-        delay: Delay between attempts in seconds
+        delay: Base delay between attempts in seconds, doubled after each failure
+        exceptions: Transient errors worth retrying; anything else propagates immediately
     """
     def decorator(func: Callable):
         @functools.wraps(func)
@@ -21,18 +28,18 @@ def retry(max_attempts: int = 3, delay: float = 1.0):
             for attempt in range(max_attempts):
                 try:
                     return await func(*args, **kwargs)
-                except Exception as e:
+                except exceptions as e:
                     last_error = e
                     if attempt < max_attempts - 1:
+                        # Exponential backoff with a little jitter; sleep without blocking the event loop
+                        wait = delay * (2 ** attempt) + random.uniform(0, 0.1 * delay)
                         logger.warning(
-                            f"Attempt {attempt + 1} failed for {func.__name__}: {str(e)}"
-                            f". Retrying in {delay} seconds..."
+                            "Attempt %d failed for %s: %s. Retrying in %.2f seconds...",
+                            attempt + 1, func.__name__, e, wait
                         )
-                        time.sleep(delay)
+                        await asyncio.sleep(wait)
                     
-            logger.error(
-                f"All {max_attempts} attempts failed for {func.__name__}"
-            )
+            logger.error("All %d attempts failed for %s", max_attempts, func.__name__)
             raise last_error
             
         return wrapper
@@ -42,9 +49,10 @@ def log_execution_time(func: Callable):
     """Decorator to log function execution time"""
     @functools.wraps(func)
     async def wrapper(*args, **kwargs):
-        start_time = time.time()
+        # perf_counter is monotonic and high-resolution, unlike wall-clock time()
+        start_time = time.perf_counter()
         result = await func(*args, **kwargs)
-        execution_time = time.time() - start_time
+        execution_time = time.perf_counter() - start_time
         
         logger.info(
             f"{func.__name__} executed in {execution_time:.2f} seconds"
@@ -1,13 +1,13 @@
 from datetime import datetime, time
 from typing import Union, Dict, Any
+import numpy as np
+
+MARKET_START = time(9, 15)  # 9:15 AM
+MARKET_END = time(15, 30)   # 3:30 PM
 
 def is_market_open() -> bool:
     """Check if market is currently open"""
-    now = datetime.now().time()
-    market_start = time(9, 15)  # 9:15 AM
-    market_end = time(15, 30)   # 3:30 PM
-    
-    return market_start <= now <= market_end
+    return MARKET_START <= datetime.now().time() <= MARKET_END
 
 def format_order_response(raw_response: Dict[str, Any]) -> Dict[str, Any]:
     """Format broker order response to standardized format"""
@@ -26,3 +26,11 @@ def calculate_position_pnl(
 ) -> float:
     """Calculate P&L for a position"""
     return quantity * (current_price - average_price)
+
+def calculate_positions_pnl_batch(
+    quantity: np.ndarray,
+    average_price: np.ndarray,
+    current_price: np.ndarray
+) -> np.ndarray:
+    """Calculate P&L for many positions at once (vectorized calculate_position_pnl)"""
+    return quantity * (current_price - average_price)
@@ -29,6 +29,7 @@ import { WS_BASE_URL } from '../config';
 
 const DEFAULT_HEIGHT = 400;
 const INDICATOR_PANE_HEIGHT = 150;
+const textDecoder = new TextDecoder();
 
 function buildWsUrl(symbol, token, base = '') {
   const q = new URLSearchParams({ token });
@@ -477,6 +478,8 @@ const EnhancedTradingChart = ({ symbol = 'TCS-EQ', sessionToken = '', debug = fa
       if (debug) console.log('WS connecting to', wsUrl);
       
       const ws = new WebSocket(wsUrl);
+      // Ticks arrive as binary frames of UTF-8 JSON
+      ws.binaryType = 'arraybuffer';
       wsRef.current = ws;
 
       ws.onopen = () => {
@@ -490,11 +493,16 @@ const EnhancedTradingChart = ({ symbol = 'TCS-EQ', sessionToken = '', debug = fa
       ws.onmessage = (ev) => {
         if (!mountedRef.current) return;
         try {
-          const payload = JSON.parse(ev.data);
-          
-          if (payload.data) {
-            const normalized = normalizeIncoming(payload.data);
-            if (normalized) handleIncomingCandle(normalized);
+          const text = typeof ev.data === 'string' ? ev.data : textDecoder.decode(ev.data);
+          const payload = JSON.parse(text);
+          // The server coalesces ticks into {type: 'batch', items: [...]} frames
+          const items = payload.type === 'batch' ? payload.items : [payload];
+
+          for (const item of items) {
+            if (item && item.data) {
+              const normalized = normalizeIncoming(item.data);
+              if (normalized) handleIncomingCandle(normalized);
+            }
           }
         } catch (e) {
           if (debug) console.warn('WS message parse failed', e);